@@ -5,13 +5,25 @@ A multilingual tutoring system with subject-specific knowledge retrieval.
 import streamlit as st
 import sys
 import json
+from collections import OrderedDict
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 # Add source directory to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from src.rag_chain import RAGChain
-from src.output_formatter import OutputFormatter
+from config import EXACT_CACHE_SIZE
+
+# Fields shown for each math solution step, in display order
+STEP_FIELDS = ("step_number", "action", "explanation", "expression", "result")
+
+# Responses longer than this are shown as plain text instead of highlighted code
+JSON_HIGHLIGHT_MAX_CHARS = 20_000
+
+# RAGChain pulls in Ollama, FAISS and numpy; it is imported where first needed
+# so the page shell renders before those load
+if TYPE_CHECKING:
+    from src.rag_chain import RAGChain
 
 
 # Page configuration
@@ -23,7 +35,7 @@ st.set_page_config(
 )
 
 # Custom CSS for better styling
-st.markdown("""
+CUSTOM_CSS = """
 <style>
     .main-header {
         background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
@@ -85,13 +97,24 @@ st.markdown("""
         background: linear-gradient(135deg, #764ba2 0%, #667eea 100%);
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+
+@st.cache_resource
+def _css() -> str:
+    """Return the custom CSS block (built once per server process)."""
+    return CUSTOM_CSS
+
+
+st.markdown(_css(), unsafe_allow_html=True)
 
 
 @st.cache_resource
 def initialize_rag_system():
     """Initialize the RAG system (cached)."""
     try:
+        from src.rag_chain import RAGChain
+        
         rag = RAGChain()
         rag.load_vector_store()
         return rag, None
@@ -99,30 +122,72 @@ def initialize_rag_system():
         return None, str(e)
 
 
+@st.cache_data(ttl=60)
+def get_cached_stats(_rag: "RAGChain"):
+    """Get system stats, vector total and non-empty subjects (cached between reruns)."""
+    stats = _rag.get_stats()
+    total_vectors = sum(stats["vector_store_stats"].values())
+    subject_counts = [
+        (subject, count)
+        for subject, count in stats["vector_store_stats"].items()
+        if count > 0
+    ]
+    return stats, total_vectors, subject_counts
+
+
+def stream_query(rag: "RAGChain", question: str, subject, q_emb) -> dict:
+    """Show the answer as it is generated, then return the structured response."""
+    from src.output_formatter import OutputFormatter  # Imported on first question, not at startup
+    
+    stream = rag.query_stream(
+        question,
+        subject_override=subject,
+        precomputed_embedding=q_emb
+    )
+    
+    placeholder = st.empty()
+    text = ""
+    while True:
+        try:
+            text += next(stream)
+        except StopIteration as stop:
+            response = stop.value
+            break
+        # Once the summary field starts, show its text instead of the raw JSON
+        summary = OutputFormatter.partial_summary(text)
+        if summary is not None:
+            placeholder.info(summary)
+        else:
+            placeholder.markdown(text)
+    
+    # The live preview is replaced by the formatted response below
+    placeholder.empty()
+    return response
+
+
 def display_response(response: dict):
     """Display the formatted response."""
-    is_math = "steps" in response
+    steps = response.get("steps")
+    is_math = steps is not None
     metadata = response.get("_metadata", {})
+    caption = response.get("caption", "Response")
+    summary = response.get("summary", "")
     
     # Caption/Title
-    caption = response.get("caption", "Response")
     st.markdown(f"### 📖 {caption}")
     
     # Summary Section
     st.markdown("#### 📝 Summary")
-    summary = response.get("summary", "")
     if summary:
         st.info(summary)
     
     if is_math:
         # Math-specific display
         st.markdown("#### 📋 Solution Steps")
-        for step in response.get("steps", []):
-            step_num = step.get("step_number", "")
-            action = step.get("action", "")
-            explanation = step.get("explanation", "")
-            expression = step.get("expression", "")
-            result = step.get("result", "")
+        for step in steps:
+            step_num, action, explanation, expression, result = (
+                step.get(key, "") for key in STEP_FIELDS
+            )
             
             with st.expander(f"**Step {step_num}:** {action}", expanded=True):
                 if explanation:
@@ -164,17 +229,16 @@ def display_response(response: dict):
             for table in response["table"]:
                 if isinstance(table, dict):
                     st.markdown(f"**{table.get('header', 'Information')}**")
-                    rows = table.get("rows", [])
+                    rows = [row for row in table.get("rows", []) if isinstance(row, dict)]
                     if rows:
-                        table_data = []
-                        for row in rows:
-                            if isinstance(row, dict):
-                                table_data.append({
-                                    "Property": row.get("property", ""),
-                                    "Value": row.get("value", "")
-                                })
-                        if table_data:
-                            st.table(table_data)
+                        import pandas as pd  # Only tables need it; kept off the cold start
+                        
+                        # Build columns directly; Streamlit converts the frame to Arrow once
+                        table_df = pd.DataFrame({
+                            "Property": [str(row.get("property", "")) for row in rows],
+                            "Value": [str(row.get("value", "")) for row in rows]
+                        })
+                        st.dataframe(table_df, use_container_width=True, hide_index=True)
     
     # Metadata Section
     st.markdown("---")
@@ -217,9 +281,8 @@ def main():
         """)
         return
     
-    # Get stats
-    stats = rag.get_stats()
-    total_vectors = sum(stats["vector_store_stats"].values())
+    # Get stats (stable between queries, so cached across reruns)
+    stats, total_vectors, subject_counts = get_cached_stats(rag)
     
     if total_vectors == 0:
         st.warning("⚠️ Vector store is empty! Please run: `python src/ingest.py`")
@@ -234,9 +297,11 @@ def main():
         
         st.markdown("---")
         st.markdown("### 📚 Vector Store")
-        for subject, count in stats["vector_store_stats"].items():
-            if count > 0:
-                st.markdown(f"• **{subject}:** {count:,} vectors")
+        for subject, count in subject_counts:
+            st.markdown(f"• **{subject}:** {count:,} vectors")
+        if st.button("🔄 Refresh Stats", use_container_width=True):
+            get_cached_stats.clear()
+            st.rerun()
         
         st.markdown("---")
         st.markdown("### ℹ️ About")
@@ -273,19 +338,39 @@ def main():
         clear_button = st.button("🗑️ Clear", use_container_width=True)
     
     if clear_button:
-        if "last_response" in st.session_state:
-            del st.session_state["last_response"]
-        st.rerun()
+        # The click already triggered this run and the response area renders
+        # below, so dropping the state is enough without a second st.rerun()
+        st.session_state.pop("last_response", None)
+        st.session_state.pop("last_json", None)
     
     # Process query
     if submit_button and user_question.strip():
-        with st.spinner("⏳ Processing your question..."):
-            try:
-                response = rag.query(user_question, subject_override=subject)
-                st.session_state["last_response"] = response
-            except Exception as e:
-                st.error(f"❌ Error processing query: {e}")
-                return
+        # Exact repeats (same normalized question and subject) skip the pipeline
+        exact_cache = st.session_state.setdefault("exact_cache", OrderedDict())
+        cache_key = (user_question.strip().casefold(), subject)
+        
+        if cache_key in exact_cache:
+            exact_cache.move_to_end(cache_key)
+            response, json_str = exact_cache[cache_key]
+        else:
+            with st.spinner("⏳ Processing your question..."):
+                try:
+                    # Embed once; reused for the cache lookup and retrieval
+                    q_emb = rag.embed(user_question)
+                    response = stream_query(rag, user_question, subject, q_emb)
+                except Exception as e:
+                    st.error(f"❌ Error processing query: {e}")
+                    return
+            
+            # Serialized once here; the JSON view and download reuse the string
+            json_str = rag.output_formatter.to_json_string(response)
+            if response.get("caption") != "Error":
+                exact_cache[cache_key] = (response, json_str)
+                if len(exact_cache) > EXACT_CACHE_SIZE:
+                    exact_cache.popitem(last=False)
+        
+        st.session_state["last_response"] = response
+        st.session_state["last_json"] = json_str
     
     # Display response if available
     if "last_response" in st.session_state:
@@ -303,9 +388,12 @@ def main():
         
         if show_json:
             st.markdown("### 📦 Raw JSON Response")
-            formatter = OutputFormatter()
-            json_str = formatter.to_json_string(response)
-            st.code(json_str, language="json")
+            json_str = st.session_state["last_json"]
+            if len(json_str) > JSON_HIGHLIGHT_MAX_CHARS:
+                # Large payloads skip syntax highlighting, which dominates render time
+                st.text_area("JSON", json_str, height=400)
+            else:
+                st.code(json_str, language="json")
             
             # Download button for JSON
             st.download_button(
@@ -3,6 +3,7 @@ School Tutor RAG System - Configuration
 """
 import os
 from pathlib import Path
+from string import Template
 from typing import Dict, List
 
 # ============================================
@@ -12,10 +13,12 @@ BASE_DIR = Path(__file__).parent
 DATA_DIR = BASE_DIR / "data"
 VECTOR_STORE_DIR = BASE_DIR / "vector_stores"
 LOGS_DIR = BASE_DIR / "logs"
+INGEST_CACHE_DIR = BASE_DIR / "ingest_cache"
 
 # Create directories if they don't exist
 VECTOR_STORE_DIR.mkdir(exist_ok=True)
 LOGS_DIR.mkdir(exist_ok=True)
+INGEST_CACHE_DIR.mkdir(exist_ok=True)
 
 # ============================================
 # MODEL CONFIGURATIONS
@@ -23,6 +26,12 @@ LOGS_DIR.mkdir(exist_ok=True)
 LLM_MODEL = "llama3.2"
 EMBEDDING_MODEL = "mxbai-embed-large"
 OLLAMA_BASE_URL = "http://localhost:11434"
+OLLAMA_KEEP_ALIVE = "30m"  # How long Ollama keeps a model loaded after its last request (None = server default, 5m)
+OLLAMA_MAX_CONNECTIONS = 16  # Idle HTTP connections to Ollama kept open for reuse
+LLM_PRELOAD = True  # Load the LLM in the background while documents are retrieved
+LLM_NUM_CTX = 8192  # Context window requested from Ollama (prompt + answer tokens)
+GENERAL_NUM_PREDICT = 1000  # Max tokens generated for general answers (summary, points, table)
+MATH_NUM_PREDICT = 700  # Max tokens generated for step-by-step math solutions
 
 # ============================================
 # CHUNKING CONFIGURATIONS
@@ -31,11 +40,45 @@ CHUNK_SIZE = 500  # Reduced for embedding model context limits
 CHUNK_OVERLAP = 100
 MAX_EMBEDDING_LENGTH = 512  # Max tokens for mxbai-embed-large
 
+# ============================================
+# INGESTION CONFIGURATIONS
+# ============================================
+INGEST_WORKERS = None  # Processes used to parse PDFs in parallel (None = one per CPU core)
+INGEST_CACHE_ENABLED = True  # Reuse chunks of PDFs unchanged since the last ingest
+EMBED_CONCURRENCY = 4  # Embedding requests in flight during ingest (match OLLAMA_NUM_PARALLEL)
+
 # ============================================
 # RETRIEVAL CONFIGURATIONS
 # ============================================
 TOP_K_RESULTS = 5
 SIMILARITY_THRESHOLD = 0.7
+CONTEXT_MMR_LAMBDA = 0.5  # Relevance traded for novelty when ordering passages for the prompt (0 = by score only)
+CONTEXT_DEDUP_THRESHOLD = 0.95  # Passages this similar to one already in the prompt are dropped
+
+# ============================================
+# INDEX CONFIGURATIONS
+# ============================================
+VECTOR_QUANTIZATION = "int8"  # "int8" stores 1 byte per dimension; "none" keeps float32
+VECTOR_INDEX_TYPE = "hnsw"  # "hnsw" graph search (sub-linear); "flat" exact scan
+HNSW_M = 16  # Graph neighbours per node
+HNSW_EF_CONSTRUCTION = 200  # Build-time candidate list (higher = better graph, slower ingest)
+HNSW_EF_SEARCH = 64  # Query-time candidate list (higher = better recall, slower search)
+IVFPQ_MIN_VECTORS = 10_000  # Larger int8 "hnsw" subjects use a product-quantized IVF index (None = never)
+IVFPQ_M = 64  # Sub-quantizers per vector: 64 one-byte codes instead of 4 bytes per dimension
+IVFPQ_NPROBE = 16  # Inverted lists scanned per query (higher = better recall, slower search)
+IVFPQ_REFINE_K_FACTOR = 5  # Rerank this many times top_k IVF-PQ candidates on int8 vectors, +1 byte per dimension (None = no rerank)
+VECTOR_MMAP = True  # Memory-map saved indices on load: pages are read on demand and shared between processes
+FAISS_THREADS = None  # OpenMP threads for index building and batched search (None = all cores)
+
+# ============================================
+# CACHE CONFIGURATIONS
+# ============================================
+SEMANTIC_CACHE_ENABLED = True
+SEMANTIC_CACHE_THRESHOLD = 0.95  # Cosine similarity for a near-duplicate question
+EXACT_CACHE_SIZE = 256  # Exact-repeat questions kept per CLI/UI session
+EMBEDDING_CACHE_SIZE = 1024  # Recent query embeddings reused without an Ollama call
+SEMANTIC_CACHE_MAX_ENTRIES = 1000  # Answers kept per subject/language; the oldest is replaced first
+CACHE_WARM_ENTRIES = 1000  # Recent logged answers loaded into the semantic cache at startup
 
 # ============================================
 # SUBJECT CONFIGURATIONS
@@ -210,3 +253,18 @@ Respond ONLY with valid JSON in this format:
 
 CRITICAL: You MUST include at least 2-3 steps and provide the final numerical answer. DO NOT leave fields empty.
 """
+
+
+def _to_template(prompt: str) -> Template:
+    """Convert a str.format prompt into a Template with only $context and $question fields."""
+    return Template(
+        prompt.replace("{context}", "$context")
+        .replace("{question}", "$question")
+        .replace("{{", "{")
+        .replace("}}", "}")
+    )
+
+
+# Pre-parsed once so each query only substitutes context and question
+GENERAL_PROMPT_TEMPLATE = _to_template(GENERAL_SYSTEM_PROMPT)
+MATH_PROMPT_TEMPLATE = _to_template(MATH_SYSTEM_PROMPT)
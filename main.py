@@ -4,12 +4,15 @@ A multilingual tutoring system with subject-specific knowledge retrieval.
 """
 import sys
 import json
+import argparse
+from collections import OrderedDict
 from pathlib import Path
+from typing import Optional
 
 # Add source directory to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from config import VECTOR_STORE_DIR
+from config import VECTOR_STORE_DIR, EXACT_CACHE_SIZE
 from src.rag_chain import RAGChain
 from src.output_formatter import OutputFormatter
 
@@ -102,19 +105,29 @@ def format_response_display(response: dict) -> str:
         output.append(f"📌 Subject: {metadata.get('subject', 'Unknown')}")
         output.append(f"🌐 Language: {metadata.get('language', 'Unknown')}")
         output.append(f"📄 Documents used: {metadata.get('documents_retrieved', 0)}")
+        if metadata.get("cache_hit"):
+            output.append("⚡ Served from semantic cache")
     
     return "\n".join(output)
 
 
 def main():
     """Main application loop."""
+    parser = argparse.ArgumentParser(description="School Tutor RAG System (CLI)")
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Disable the semantic cache and always run retrieval + generation"
+    )
+    args = parser.parse_args()
+    
     print_banner()
     
     # Initialize RAG chain
     print("🔧 Initializing system...")
     
     try:
-        rag = RAGChain()
+        rag = RAGChain(use_cache=not args.no_cache)
         rag.load_vector_store()
         stats = rag.get_stats()
         
@@ -135,7 +148,9 @@ def main():
         print("  3. Data has been ingested (python src/ingest.py)")
         return
     
-    formatter = OutputFormatter()
+    # Exact-repeat cache: normalized question -> (response, display text, JSON text).
+    # --no-cache disables it too, so every question runs retrieval and generation.
+    exact_cache: "Optional[OrderedDict[str, tuple]]" = None if args.no_cache else OrderedDict()
     
     # Main loop
     print("\n" + "-" * 60)
@@ -159,6 +174,7 @@ def main():
                 stats = rag.get_stats()
                 print(f"  LLM Model: {stats['llm_model']}")
                 print(f"  Embedding Model: {stats['embedding_model']}")
+                print(f"  Cached Responses: {stats['cached_responses']}")
                 print("  Vector Store:")
                 for subject, count in stats["vector_store_stats"].items():
                     print(f"    {subject}: {count} vectors")
@@ -169,16 +185,40 @@ def main():
                 json_mode = True
                 continue
             
-            # Process query
-            print("\n⏳ Processing your question...")
-            response = rag.query(user_input)
+            # Exact repeats skip embedding, retrieval, generation and formatting
+            normalized = user_input.strip().casefold()
+            cached = exact_cache.get(normalized) if exact_cache is not None else None
+            if cached is not None:
+                exact_cache.move_to_end(normalized)
+                response, display, json_str = cached
+            else:
+                # Process query
+                print("\n⏳ Processing your question...")
+                q_emb = rag.embed(user_input)
+                stream = rag.query_stream(user_input, precomputed_embedding=q_emb)
+                
+                # Print tokens as they arrive; the structured response is the return value
+                while True:
+                    try:
+                        print(next(stream), end="", flush=True)
+                    except StopIteration as stop:
+                        response = stop.value
+                        break
+                print()
+                display = format_response_display(response)
+                json_str = OutputFormatter.to_json_string(response)
+                
+                if exact_cache is not None and response.get("caption") != "Error":
+                    exact_cache[normalized] = (response, display, json_str)
+                    if len(exact_cache) > EXACT_CACHE_SIZE:
+                        exact_cache.popitem(last=False)
             
             # Display response
-            print(format_response_display(response))
+            print(display)
             
             # Also print raw JSON for debugging
             print("\n📦 Raw JSON Response:")
-            print(formatter.to_json_string(response))
+            print(json_str)
             
         except KeyboardInterrupt:
             print("\n\n👋 Session interrupted. Goodbye!")
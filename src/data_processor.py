@@ -2,9 +2,16 @@
 Data Processor Module
 Handles PDF text extraction, chunking, and preprocessing for the RAG system.
 """
+import hashlib
+import io
+import os
+import pickle
 import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from pypdf import PdfReader
 from tqdm import tqdm
 
@@ -13,10 +20,65 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from config import (
     CHUNK_SIZE, CHUNK_OVERLAP, DATA_DIR, 
-    SUBJECTS, CONTENT_TYPES
+    SUBJECTS, CONTENT_TYPES, INGEST_WORKERS,
+    INGEST_CACHE_DIR, INGEST_CACHE_ENABLED
 )
 from src.metadata_extractor import MetadataExtractor
 
+# Text cleaning patterns, compiled once and reused for every page
+_WHITESPACE_RE = re.compile(r'\s+')
+_PAGE_NUMBER_RE = re.compile(r'^\d+\s*$', re.MULTILINE)
+# Keep: Tamil (0B80-0BFF), basic Latin, numbers, math symbols
+_DISALLOWED_CHARS_RE = re.compile(
+    r'[^\u0B80-\u0BFF\u0000-\u007F\u2200-\u22FF\s\.\,\;\:\!\?\-\(\)\[\]\{\}\+\=\*\/\%\^\<\>\°]'
+)
+_MULTISPACE_RE = re.compile(r' +')
+
+# Number of upcoming PDFs read into memory while the current one is parsed
+PDF_READ_AHEAD = 2
+
+# Part of every ingest cache key; bump it when extraction, chunking or
+# metadata detection changes so cached chunks are rebuilt
+_INGEST_CACHE_VERSION = 1
+
+# Sentence bodies between English and Tamil sentence endings
+_SENTENCE_RE = re.compile(r'[^.!?।॥]+')
+
+# Common chapter patterns (case-insensitive, so "CHAPTER" is covered too)
+_CHAPTER_PATTERNS = [
+    re.compile(r'Chapter\s*(\d+)\s*[:\-]?\s*(.+?)(?:\n|$)', re.IGNORECASE),
+    re.compile(r'Unit\s*(\d+)\s*[:\-]?\s*(.+?)(?:\n|$)', re.IGNORECASE),
+    re.compile(r'அலகு\s*(\d+)\s*[:\-]?\s*(.+?)(?:\n|$)'),  # Tamil unit pattern (Tamil has no case)
+]
+# Literal stems every chapter pattern needs; most pages contain none of them
+_CHAPTER_HINTS = ('chapter', 'unit', 'அலகு')
+
+# Topic detection (section headers)
+_TOPIC_PATTERNS = [
+    re.compile(r'^(\d+\.\d+)\s+(.+?)(?:\n|$)', re.MULTILINE),
+    re.compile(r'^([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s*$', re.MULTILINE),
+]
+
+# Content type keywords, checked in priority order (first type with any match wins)
+_CONTENT_TYPE_KEYWORDS = (
+    ("exercise", (
+        'solve', 'find', 'calculate', 'exercise', 'problem',
+        'கணக்கிடுக', 'தீர்க்க'  # Tamil exercise keywords
+    )),
+    ("example", (
+        'example', 'for instance', 'such as', 'e.g.',
+        'எடுத்துக்காட்டு', 'உதாரணம்'  # Tamil example keywords
+    )),
+    ("definition", (
+        'definition', 'is defined as', 'refers to',
+        'வரையறை', 'என்பது'  # Tamil definition keywords
+    )),
+    ("formula", (
+        'formula', '=', 'equation',
+        'சூத்திரம்'  # Tamil formula keyword
+    )),
+)
+
 
 class DataProcessor:
     """Processes PDF documents for ingestion into the RAG system."""
@@ -26,21 +88,32 @@ class DataProcessor:
         self.chunk_overlap = chunk_overlap
         self.metadata_extractor = MetadataExtractor()
     
-    def extract_text_from_pdf(self, pdf_path: Path) -> List[Dict[str, Any]]:
+    def extract_text_from_pdf(
+        self,
+        pdf_path: Path,
+        pdf_bytes: Optional[bytes] = None
+    ) -> Iterator[Dict[str, Any]]:
         """
         Extract text from a PDF file with page-level metadata.
         
+        Pages are yielded one at a time so a large book is never held in
+        memory as a whole.
+        
         Args:
             pdf_path: Path to the PDF file
+            pdf_bytes: Optional file contents already read from pdf_path
             
-        Returns:
-            List of dictionaries containing text and page metadata
+        Yields:
+            Dictionaries containing text and page metadata
         """
-        pages_data = []
+        try:
+            source = io.BytesIO(pdf_bytes) if pdf_bytes is not None else str(pdf_path)
+            reader = PdfReader(source)
+        except Exception as e:
+            print(f"Error reading PDF {pdf_path}: {e}")
+            return
         
         try:
-            reader = PdfReader(str(pdf_path))
-            
             for page_num, page in enumerate(reader.pages, 1):
                 text = page.extract_text()
                 
@@ -48,16 +121,14 @@ class DataProcessor:
                     # Clean the extracted text
                     cleaned_text = self._clean_text(text)
                     
-                    pages_data.append({
+                    yield {
                         "text": cleaned_text,
                         "page_number": page_num,
                         "source_file": pdf_path.name
-                    })
+                    }
                     
         except Exception as e:
             print(f"Error reading PDF {pdf_path}: {e}")
-            
-        return pages_data
     
     def _clean_text(self, text: str) -> str:
         """
@@ -70,81 +141,80 @@ class DataProcessor:
             Cleaned text
         """
         # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
+        text = _WHITESPACE_RE.sub(' ', text)
         
         # Remove page numbers and headers (common patterns)
-        text = re.sub(r'^\d+\s*$', '', text, flags=re.MULTILINE)
+        text = _PAGE_NUMBER_RE.sub('', text)
         
         # Remove special characters but keep Tamil and mathematical symbols
-        # Keep: Tamil (0B80-0BFF), basic Latin, numbers, math symbols
-        text = re.sub(r'[^\u0B80-\u0BFF\u0000-\u007F\u2200-\u22FF\s\.\,\;\:\!\?\-\(\)\[\]\{\}\+\=\*\/\%\^\<\>\°]', '', text)
-        
-        # Normalize multiple spaces
-        text = re.sub(r' +', ' ', text)
+        # (all of ASCII is allowed, so English-only pages skip the scan)
+        if not text.isascii():
+            text, removed = _DISALLOWED_CHARS_RE.subn('', text)
+            
+            # Normalize multiple spaces (only removals can leave new runs of spaces)
+            if removed:
+                text = _MULTISPACE_RE.sub(' ', text)
         
         return text.strip()
     
-    def chunk_text(self, text: str, metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def chunk_text(
+        self,
+        text: str,
+        metadata: Dict[str, Any],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]]
+    ) -> None:
         """
-        Split text into overlapping chunks with metadata.
+        Split text into overlapping chunks, appending them to parallel lists.
+        
+        Every chunk references the same metadata dict (one per page), so it
+        must be treated as read-only; copy it before changing a single chunk.
         
         Args:
             text: Text to chunk
             metadata: Metadata to attach to each chunk
-            
-        Returns:
-            List of chunks with metadata
+            texts: List that receives the chunk texts
+            metadatas: List that receives each chunk's metadata, aligned with texts
         """
-        chunks = []
-        
         if len(text) <= self.chunk_size:
-            chunks.append({
-                "text": text,
-                "metadata": metadata.copy()
-            })
-            return chunks
+            texts.append(text)
+            metadatas.append(metadata)
+            return
         
-        # Split by sentences first for better context preservation
-        sentences = self._split_into_sentences(text)
-        
-        current_chunk = ""
+        # Pieces of the chunk being built, joined once when the chunk is emitted
+        pieces: List[str] = []
         current_length = 0
         
-        for sentence in sentences:
+        # Walk sentences as they are found for better context preservation
+        for sentence in self._iter_sentences(text):
             sentence_length = len(sentence)
             
             if current_length + sentence_length <= self.chunk_size:
-                current_chunk += sentence + " "
+                pieces += (sentence, " ")
                 current_length += sentence_length + 1
             else:
+                current_chunk = "".join(pieces)
                 if current_chunk:
-                    chunk_metadata = metadata.copy()
-                    chunks.append({
-                        "text": current_chunk.strip(),
-                        "metadata": chunk_metadata
-                    })
+                    texts.append(current_chunk.strip())
+                    metadatas.append(metadata)
                 
                 # Start new chunk with overlap
                 overlap_text = self._get_overlap_text(current_chunk)
-                current_chunk = overlap_text + sentence + " "
-                current_length = len(current_chunk)
+                pieces = [overlap_text, sentence, " "]
+                current_length = len(overlap_text) + sentence_length + 1
         
         # Add the last chunk
+        current_chunk = "".join(pieces)
         if current_chunk.strip():
-            chunk_metadata = metadata.copy()
-            chunks.append({
-                "text": current_chunk.strip(),
-                "metadata": chunk_metadata
-            })
-        
-        return chunks
+            texts.append(current_chunk.strip())
+            metadatas.append(metadata)
     
-    def _split_into_sentences(self, text: str) -> List[str]:
-        """Split text into sentences."""
-        # Handle both English and Tamil sentence endings
-        sentence_endings = r'[.!?।॥]+'
-        sentences = re.split(sentence_endings, text)
-        return [s.strip() for s in sentences if s.strip()]
+    def _iter_sentences(self, text: str) -> Iterator[str]:
+        """Yield the non-empty sentences of the text, without building a list."""
+        for match in _SENTENCE_RE.finditer(text):
+            sentence = match.group().strip()
+            if sentence:
+                yield sentence
     
     def _get_overlap_text(self, text: str) -> str:
         """Get the last portion of text for overlap."""
@@ -152,13 +222,19 @@ class DataProcessor:
             return text
         return text[-self.chunk_overlap:]
     
-    def detect_chapter_topic(self, text: str, page_num: int) -> Tuple[Optional[str], Optional[str]]:
+    def detect_chapter_topic(
+        self,
+        text: str,
+        page_num: int,
+        text_lower: Optional[str] = None
+    ) -> Tuple[Optional[str], Optional[str]]:
         """
         Detect chapter and topic from text content.
         
         Args:
             text: Text content
             page_num: Page number
+            text_lower: Optional text.lower(), if the caller already has it
             
         Returns:
             Tuple of (chapter, topic)
@@ -166,142 +242,303 @@ class DataProcessor:
         chapter = None
         topic = None
         
-        # Common chapter patterns
-        chapter_patterns = [
-            r'Chapter\s*(\d+)\s*[:\-]?\s*(.+?)(?:\n|$)',
-            r'CHAPTER\s*(\d+)\s*[:\-]?\s*(.+?)(?:\n|$)',
-            r'Unit\s*(\d+)\s*[:\-]?\s*(.+?)(?:\n|$)',
-            r'அலகு\s*(\d+)\s*[:\-]?\s*(.+?)(?:\n|$)',  # Tamil unit pattern
-        ]
-        
-        for pattern in chapter_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                chapter = f"Chapter {match.group(1)}: {match.group(2).strip()}"
-                break
+        # Cheap substring prefilter before running the chapter regexes
+        if text_lower is None:
+            text_lower = text.lower()
+        if any(hint in text_lower for hint in _CHAPTER_HINTS):
+            for pattern in _CHAPTER_PATTERNS:
+                match = pattern.search(text)
+                if match:
+                    chapter = f"Chapter {match.group(1)}: {match.group(2).strip()}"
+                    break
         
         # Topic detection (section headers)
-        topic_patterns = [
-            r'^(\d+\.\d+)\s+(.+?)(?:\n|$)',
-            r'^([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s*$',
-        ]
-        
-        for pattern in topic_patterns:
-            match = re.search(pattern, text, re.MULTILINE)
+        for pattern in _TOPIC_PATTERNS:
+            match = pattern.search(text)
             if match:
                 topic = match.group(0).strip()[:100]  # Limit topic length
                 break
         
         return chapter, topic
     
-    def detect_content_type(self, text: str) -> str:
+    def detect_content_type(self, text: str, text_lower: Optional[str] = None) -> str:
         """
         Detect the type of content (theory, example, exercise, etc.)
         
         Args:
             text: Text content
+            text_lower: Optional text.lower(), if the caller already has it
             
         Returns:
             Content type string
         """
-        text_lower = text.lower()
-        
-        # Check for exercise/problem patterns
-        if any(pattern in text_lower for pattern in [
-            'solve', 'find', 'calculate', 'exercise', 'problem',
-            'கணக்கிடுக', 'தீர்க்க'  # Tamil exercise keywords
-        ]):
-            return "exercise"
-        
-        # Check for example patterns
-        if any(pattern in text_lower for pattern in [
-            'example', 'for instance', 'such as', 'e.g.',
-            'எடுத்துக்காட்டு', 'உதாரணம்'  # Tamil example keywords
-        ]):
-            return "example"
-        
-        # Check for definition patterns
-        if any(pattern in text_lower for pattern in [
-            'definition', 'is defined as', 'refers to',
-            'வரையறை', 'என்பது'  # Tamil definition keywords
-        ]):
-            return "definition"
-        
-        # Check for formula patterns
-        if any(pattern in text_lower for pattern in [
-            'formula', '=', 'equation',
-            'சூத்திரம்'  # Tamil formula keyword
-        ]):
-            return "formula"
+        if text_lower is None:
+            text_lower = text.lower()
+        
+        # Substring checks run in C and stop at the first hit, which beats a
+        # combined alternation regex (Python's engine backtracks per position)
+        for content_type, keywords in _CONTENT_TYPE_KEYWORDS:
+            if any(keyword in text_lower for keyword in keywords):
+                return content_type
         
         return "theory"
     
-    def process_all_pdfs(self, data_dir: Path = DATA_DIR) -> Dict[str, List[Dict[str, Any]]]:
+    def process_pdf(
+        self,
+        pdf_path: Path,
+        pdf_bytes: Optional[bytes] = None
+    ) -> Tuple[str, List[str], List[Dict[str, Any]]]:
         """
-        Process all PDFs in the data directory and organize by subject.
+        Extract, annotate and chunk a single PDF.
         
         Args:
-            data_dir: Directory containing PDF files
+            pdf_path: Path to the PDF file
+            pdf_bytes: Optional file contents already read from pdf_path
             
         Returns:
-            Dictionary mapping subjects to list of processed chunks
+            Tuple of (subject, chunk texts, chunk metadata aligned with the texts)
         """
-        processed_data = {subject: [] for subject in SUBJECTS}
+        # Extract metadata from filename
+        file_metadata = self.metadata_extractor.extract_from_filename(pdf_path.name)
+        subject = file_metadata.get("subject", "Science")
         
-        pdf_files = list(data_dir.glob("*.pdf"))
-        print(f"Found {len(pdf_files)} PDF files to process")
+        texts: List[str] = []
+        metadatas: List[Dict[str, Any]] = []
         
-        for pdf_path in tqdm(pdf_files, desc="Processing PDFs"):
-            # Extract metadata from filename
-            file_metadata = self.metadata_extractor.extract_from_filename(pdf_path.name)
-            subject = file_metadata.get("subject", "Science")
+        # Extract text from PDF, chunking each page as it is read
+        for page_data in self.extract_text_from_pdf(pdf_path, pdf_bytes):
+            text = page_data["text"]
+            page_num = page_data["page_number"]
+            # Lowercased once and shared by the keyword detectors below
+            text_lower = text.lower()
             
-            # Extract text from PDF
-            pages = self.extract_text_from_pdf(pdf_path)
+            # Detect chapter and topic
+            chapter, topic = self.detect_chapter_topic(text, page_num, text_lower)
             
-            for page_data in pages:
-                text = page_data["text"]
-                page_num = page_data["page_number"]
-                
-                # Detect chapter and topic
-                chapter, topic = self.detect_chapter_topic(text, page_num)
-                
-                # Detect content type
-                content_type = self.detect_content_type(text)
-                
-                # Build complete metadata
-                metadata = {
-                    **file_metadata,
-                    "chapter": chapter or "Unknown",
-                    "topic": topic or "General",
-                    "content_type": content_type,
-                    "page_number": page_num,
-                    "source_file": pdf_path.name
-                }
-                
-                # Chunk the text
-                chunks = self.chunk_text(text, metadata)
-                
-                # Add to appropriate subject
-                if subject in processed_data:
-                    processed_data[subject].extend(chunks)
-                else:
-                    processed_data["Science"].extend(chunks)
+            # Detect content type
+            content_type = self.detect_content_type(text, text_lower)
+            
+            # Detect sub-subject once per page; all of the page's chunks share it
+            sub_subject = self.metadata_extractor.detect_sub_subject_from_content(
+                text, subject, text_lower
+            )
+            
+            # Build complete metadata
+            metadata = {
+                **file_metadata,
+                "sub_subject": sub_subject,
+                "chapter": chapter or "Unknown",
+                "topic": topic or "General",
+                "content_type": content_type,
+                "page_number": page_num,
+                "source_file": pdf_path.name
+            }
+            
+            # Chunk the text
+            self.chunk_text(text, metadata, texts, metadatas)
+        
+        return subject, texts, metadatas
+    
+    def _cache_path(self, pdf_path: Path, cache_dir: Path) -> Path:
+        """Cache file for a PDF; changes whenever the file or chunk settings change."""
+        stat = pdf_path.stat()
+        key = (
+            f"{_INGEST_CACHE_VERSION}_{pdf_path.name}_{stat.st_mtime_ns}_{stat.st_size}"
+            f"_{self.chunk_size}_{self.chunk_overlap}"
+        )
+        return cache_dir / f"{hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()}.pkl"
+    
+    def _load_cached(
+        self,
+        pdf_path: Path,
+        cache_dir: Path
+    ) -> Optional[Tuple[str, List[str], List[Dict[str, Any]]]]:
+        """
+        Load a PDF's processed chunks from the ingest cache.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            cache_dir: Directory holding cached results
+            
+        Returns:
+            Cached (subject, texts, metadatas), or None if missing or unreadable
+        """
+        try:
+            with open(self._cache_path(pdf_path, cache_dir), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Ignoring unreadable ingest cache for {pdf_path.name}: {e}")
+            return None
+    
+    def _store_cached(
+        self,
+        pdf_path: Path,
+        cache_dir: Path,
+        result: Tuple[str, List[str], List[Dict[str, Any]]]
+    ) -> None:
+        """Write a PDF's processed chunks to the ingest cache."""
+        cache_path = self._cache_path(pdf_path, cache_dir)
+        tmp_path = cache_path.with_suffix(".tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            # Rename so an interrupted write never leaves a truncated cache file
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"Could not cache {pdf_path.name}: {e}")
+    
+    def process_all_pdfs(
+        self,
+        data_dir: Path = DATA_DIR,
+        workers: Optional[int] = INGEST_WORKERS,
+        cache_dir: Optional[Path] = INGEST_CACHE_DIR if INGEST_CACHE_ENABLED else None
+    ) -> Dict[str, Dict[str, List[Any]]]:
+        """
+        Process all PDFs in the data directory and organize by subject.
+        
+        Args:
+            data_dir: Directory containing PDF files
+            workers: Number of processes for parsing PDFs (None = one per CPU core)
+            cache_dir: Directory for per-PDF results, so unchanged files are not
+                parsed again (None always parses every file)
+            
+        Returns:
+            Dictionary mapping subjects to parallel "texts" and "metadatas" lists
+        """
+        processed_data = {subject: {"texts": [], "metadatas": []} for subject in SUBJECTS}
+        
+        all_pdf_files = list_pdf_files(data_dir)
+        print(f"Found {len(all_pdf_files)} PDF files to process")
+        
+        # Reuse results for files unchanged since they were cached
+        cached = {}
+        if cache_dir is not None:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            for pdf_path in all_pdf_files:
+                result = self._load_cached(pdf_path, cache_dir)
+                if result is not None:
+                    cached[pdf_path] = result
+            if cached:
+                print(f"Reusing cached chunks for {len(cached)} unchanged PDF files")
+        pdf_files = [pdf_path for pdf_path in all_pdf_files if pdf_path not in cached]
+        
+        workers = min(workers or os.cpu_count() or 1, len(pdf_files))
+        if workers > 1:
+            # PDF parsing is CPU-bound and independent per file; imap keeps
+            # results in file order so chunk order matches a serial run
+            with Pool(workers, _init_worker, (self.chunk_size, self.chunk_overlap)) as pool:
+                results = list(tqdm(
+                    pool.imap(_process_pdf_in_worker, pdf_files),
+                    total=len(pdf_files),
+                    desc="Processing PDFs"
+                ))
+        else:
+            # Serial parsing: overlap reading the next files with parsing this one
+            results = [
+                self.process_pdf(pdf_path, pdf_bytes)
+                for pdf_path, pdf_bytes in tqdm(
+                    _read_ahead(pdf_files), total=len(pdf_files), desc="Processing PDFs"
+                )
+            ]
+        
+        parsed = dict(zip(pdf_files, results))
+        if cache_dir is not None:
+            for pdf_path, result in parsed.items():
+                # Files that yielded no text may have failed to open; retry them next time
+                if result[1]:
+                    self._store_cached(pdf_path, cache_dir, result)
+        
+        # Merge in directory order, so the output does not depend on the cache
+        for pdf_path in all_pdf_files:
+            subject, texts, metadatas = cached.get(pdf_path) or parsed[pdf_path]
+            # Add to appropriate subject
+            columns = processed_data.get(subject, processed_data["Science"])
+            columns["texts"].extend(texts)
+            columns["metadatas"].extend(metadatas)
         
         # Print summary
-        for subject, chunks in processed_data.items():
-            print(f"  {subject}: {len(chunks)} chunks")
+        for subject, columns in processed_data.items():
+            print(f"  {subject}: {len(columns['texts'])} chunks")
         
         return processed_data
 
 
+def list_pdf_files(data_dir: Path) -> List[Path]:
+    """
+    List the PDF files directly inside a directory.
+    
+    os.scandir reads the file type from the directory entry itself, so no
+    per-file stat() or Path wrapping happens for entries that are skipped.
+    
+    Args:
+        data_dir: Directory to scan
+        
+    Returns:
+        Paths of the PDF files, in directory order
+    """
+    with os.scandir(data_dir) as entries:
+        return [
+            Path(entry.path) for entry in entries
+            if entry.name.lower().endswith(".pdf") and entry.is_file()
+        ]
+
+
+def _read_ahead(
+    pdf_paths: List[Path],
+    depth: int = PDF_READ_AHEAD
+) -> Iterator[Tuple[Path, Optional[bytes]]]:
+    """
+    Yield each path with its contents, reading upcoming files in background threads.
+    
+    Args:
+        pdf_paths: Files to read, in order
+        depth: How many files to read ahead of the consumer
+        
+    Yields:
+        Tuples of (path, bytes), with None bytes if the read failed
+    """
+    def read(path: Path) -> Optional[bytes]:
+        try:
+            return path.read_bytes()
+        except OSError:
+            return None  # The parser reopens the path and reports the error
+    
+    with ThreadPoolExecutor(max_workers=depth) as executor:
+        pending = deque()
+        for path in pdf_paths:
+            pending.append((path, executor.submit(read, path)))
+            if len(pending) > depth:
+                ready_path, future = pending.popleft()
+                yield ready_path, future.result()
+        while pending:
+            ready_path, future = pending.popleft()
+            yield ready_path, future.result()
+
+
+# Per-process DataProcessor used by process_all_pdfs workers
+_worker_processor: Optional[DataProcessor] = None
+
+
+def _init_worker(chunk_size: int, chunk_overlap: int) -> None:
+    """Create the worker's DataProcessor once, with the parent's chunk settings."""
+    global _worker_processor
+    _worker_processor = DataProcessor(chunk_size, chunk_overlap)
+
+
+def _process_pdf_in_worker(pdf_path: Path) -> Tuple[str, List[str], List[Dict[str, Any]]]:
+    """Process one PDF in a pool worker."""
+    return _worker_processor.process_pdf(pdf_path)
+
+
 if __name__ == "__main__":
     # Test the data processor
     processor = DataProcessor()
     data = processor.process_all_pdfs()
     
-    for subject, chunks in data.items():
-        if chunks:
+    for subject, columns in data.items():
+        if columns["texts"]:
             print(f"\n{subject} - Sample chunk:")
-            print(f"  Text: {chunks[0]['text'][:200]}...")
-            print(f"  Metadata: {chunks[0]['metadata']}")
+            print(f"  Text: {columns['texts'][0][:200]}...")
+            print(f"  Metadata: {columns['metadatas'][0]}")
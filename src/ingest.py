@@ -9,9 +9,8 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config import DATA_DIR, VECTOR_STORE_DIR, SUBJECTS
-from src.data_processor import DataProcessor
+from src.data_processor import DataProcessor, list_pdf_files
 from src.vector_store import VectorStore
-from src.metadata_extractor import MetadataExtractor
 
 
 def main():
@@ -24,7 +23,6 @@ def main():
     print("\n🔧 Initializing components...")
     processor = DataProcessor()
     vector_store = VectorStore()
-    metadata_extractor = MetadataExtractor()
     
     # Check if data directory exists
     if not DATA_DIR.exists():
@@ -33,7 +31,7 @@ def main():
         return
     
     # Count PDF files
-    pdf_files = list(DATA_DIR.glob("*.pdf"))
+    pdf_files = list_pdf_files(DATA_DIR)
     if not pdf_files:
         print(f"❌ No PDF files found in {DATA_DIR}")
         return
@@ -47,22 +45,12 @@ def main():
     # Create indices for each subject
     print("\n📊 Creating FAISS indices...")
     for subject in SUBJECTS:
-        docs = processed_data.get(subject, [])
-        if docs:
+        columns = processed_data.get(subject)
+        if columns and columns["texts"]:
             print(f"\n  Creating index for {subject}...")
             
-            # Enrich metadata with content-based detection
-            enriched_docs = []
-            for doc in docs:
-                text = doc.get("text", "")
-                metadata = doc.get("metadata", {})
-                enriched_metadata = metadata_extractor.enrich_metadata(metadata, text)
-                enriched_docs.append({
-                    "text": text,
-                    "metadata": enriched_metadata
-                })
-            
-            vector_store.create_index(subject, enriched_docs)
+            # Sub-subject was already detected per page during processing
+            vector_store.create_index(subject, columns["texts"], columns["metadatas"])
         else:
             print(f"\n  ⚠️ No documents for {subject}")
     
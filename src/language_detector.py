@@ -3,6 +3,7 @@ Language Detector Module
 Detects query language (English/Tamil) for appropriate response generation.
 """
 import re
+import string
 from typing import Tuple
 
 
@@ -13,6 +14,14 @@ class LanguageDetector:
     TAMIL_RANGE_START = 0x0B80
     TAMIL_RANGE_END = 0x0BFF
     
+    # Characters are counted on the UTF-8 bytes, in C. Every Tamil code point
+    # (U+0B80-U+0BFF) encodes as E0 AE xx or E0 AF xx, and ASCII letters are
+    # single bytes that never occur inside a multi-byte sequence.
+    _TAMIL_UTF8_PREFIXES = (b"\xe0\xae", b"\xe0\xaf")
+    _ASCII_LETTER_BYTES = string.ascii_letters.encode("ascii")
+    # Lets contains_tamil stop at the first Tamil character
+    _TAMIL_CHAR_RE = re.compile(f"[{chr(TAMIL_RANGE_START)}-{chr(TAMIL_RANGE_END)}]")
+    
     # Phrases that indicate user wants Tamil response
     TAMIL_REQUEST_PHRASES = [
         'in tamil',
@@ -40,11 +49,24 @@ class LanguageDetector:
         Returns:
             True if user is requesting Tamil response
         """
-        text_lower = text.lower()
-        for phrase in self.TAMIL_REQUEST_PHRASES:
-            if phrase.lower() in text_lower:
-                return True
-        return False
+        # Phrases are stored lowercase, so only the text needs folding
+        text_lower = text.casefold()
+        return any(phrase in text_lower for phrase in self.TAMIL_REQUEST_PHRASES)
+    
+    def _count_chars(self, text: str) -> Tuple[int, int]:
+        """
+        Count Tamil characters and ASCII letters in the text.
+        
+        Args:
+            text: Text to analyze
+            
+        Returns:
+            Tuple of (tamil_chars, english_chars)
+        """
+        data = text.encode("utf-8", "surrogatepass")
+        english_chars = len(data) - len(data.translate(None, self._ASCII_LETTER_BYTES))
+        tamil_chars = sum(data.count(prefix) for prefix in self._TAMIL_UTF8_PREFIXES)
+        return tamil_chars, english_chars
     
     def detect(self, text: str) -> str:
         """
@@ -60,18 +82,7 @@ class LanguageDetector:
         if self._check_tamil_request(text):
             return "Tamil"
         
-        tamil_chars = 0
-        english_chars = 0
-        
-        for char in text:
-            code_point = ord(char)
-            
-            # Check if Tamil character
-            if self.TAMIL_RANGE_START <= code_point <= self.TAMIL_RANGE_END:
-                tamil_chars += 1
-            # Check if English letter
-            elif char.isalpha() and code_point < 128:
-                english_chars += 1
+        tamil_chars, english_chars = self._count_chars(text)
         
         # If more than 20% Tamil characters, consider it Tamil
         total_chars = tamil_chars + english_chars
@@ -94,11 +105,9 @@ class LanguageDetector:
         Returns:
             True if Tamil characters are found
         """
-        for char in text:
-            code_point = ord(char)
-            if self.TAMIL_RANGE_START <= code_point <= self.TAMIL_RANGE_END:
-                return True
-        return False
+        if text.isascii():
+            return False
+        return self._TAMIL_CHAR_RE.search(text) is not None
     
     def get_language_info(self, text: str) -> Tuple[str, float, float]:
         """
@@ -114,16 +123,7 @@ class LanguageDetector:
         if self._check_tamil_request(text):
             return "Tamil", 1.0, 0.0
         
-        tamil_chars = 0
-        english_chars = 0
-        
-        for char in text:
-            code_point = ord(char)
-            
-            if self.TAMIL_RANGE_START <= code_point <= self.TAMIL_RANGE_END:
-                tamil_chars += 1
-            elif char.isalpha() and code_point < 128:
-                english_chars += 1
+        tamil_chars, english_chars = self._count_chars(text)
         
         total_chars = tamil_chars + english_chars
         if total_chars == 0:
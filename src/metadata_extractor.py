@@ -3,9 +3,46 @@ Metadata Extractor Module
 Extracts and generates metadata from PDF filenames and content.
 """
 import re
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from pathlib import Path
 
+# Optional: pyahocorasick finds all sub-subject keywords in one pass over a page
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+def _build_sub_subject_automata(
+    sub_subject_keywords: Dict[str, Tuple[Tuple[str, Tuple[str, ...]], ...]]
+) -> Dict[str, Any]:
+    """
+    Compile each subject's sub-subject keywords into an Aho-Corasick automaton.
+    
+    Args:
+        sub_subject_keywords: Mapping of subject to (sub-subject, keywords) pairs
+        
+    Returns:
+        Mapping of subject to automaton whose values are (keyword, sub-subject indices);
+        empty if pyahocorasick is unavailable
+    """
+    if ahocorasick is None:
+        return {}
+    
+    automata = {}
+    for subject, sub_subjects in sub_subject_keywords.items():
+        owners: Dict[str, list] = {}
+        for index, (_, keywords) in enumerate(sub_subjects):
+            for keyword in keywords:
+                owners.setdefault(keyword, []).append(index)
+        
+        automaton = ahocorasick.Automaton()
+        for keyword, indices in owners.items():
+            automaton.add_word(keyword, (keyword, tuple(indices)))
+        automaton.make_automaton()
+        automata[subject] = automaton
+    return automata
+
 
 class MetadataExtractor:
     """Extracts metadata from filenames and content."""
@@ -27,6 +64,87 @@ class MetadataExtractor:
         "Tamil": [r"_TM\.pdf$", r"_TM_", r"Tamil"]
     }
     
+    # Each subject's / language's patterns compiled into one alternation,
+    # kept in the priority order above
+    _SUBJECT_RES = {
+        subject: re.compile("|".join(patterns), re.IGNORECASE)
+        for subject, patterns in SUBJECT_PATTERNS.items()
+    }
+    _LANGUAGE_RES = {
+        language: re.compile("|".join(patterns))
+        for language, patterns in LANGUAGE_PATTERNS.items()
+    }
+    _GRADE_RE = re.compile(r'(\d+)(?:th|st|nd|rd)?[_\s]', re.IGNORECASE)
+    _TERM_RE = re.compile(r'Term[_\s]*(I{1,3}|\d+)', re.IGNORECASE)
+    
+    # Tokens of the usual "7th_Science_Term_II_EM.pdf" naming, for the
+    # split-based fast path in _parse_standard_filename
+    _SUBJECT_TOKENS = {
+        "science": "Science",
+        "socialscience": "Social_Science",
+        "maths": "Maths",
+        "math": "Maths",
+        "english": "English",
+        "tamil": "Tamil"
+    }
+    _ROMAN_TO_ARABIC = {"I": "1", "II": "2", "III": "3"}
+    _ORDINAL_SUFFIXES = ("th", "st", "nd", "rd")
+    
+    # Content keywords per sub-subject; on a tie the earlier sub-subject wins
+    SUB_SUBJECT_KEYWORDS = {
+        "Science": (
+            ("Physics", (
+                "force", "motion", "energy", "gravity", "velocity", 
+                "acceleration", "momentum", "wave", "light", "sound",
+                "விசை", "இயக்கம்", "ஆற்றல்"
+            )),
+            ("Chemistry", (
+                "atom", "molecule", "element", "compound", "reaction",
+                "acid", "base", "chemical", "periodic", "bond",
+                "அணு", "மூலக்கூறு", "தனிமம்"
+            )),
+            ("Biology", (
+                "cell", "organism", "plant", "animal", "photosynthesis",
+                "respiration", "digestion", "circulation", "nervous",
+                "செல்", "உயிரினம்", "தாவரம்"
+            )),
+        ),
+        "Maths": (
+            ("Algebra", (
+                "equation", "variable", "polynomial", "linear", "quadratic",
+                "சமன்பாடு", "மாறி"
+            )),
+            ("Geometry", (
+                "triangle", "circle", "angle", "area", "perimeter",
+                "முக்கோணம்", "வட்டம்", "பரப்பு"
+            )),
+            ("Arithmetic", (
+                "number", "fraction", "decimal", "percentage", "ratio",
+                "எண்", "பின்னம்", "விகிதம்"
+            )),
+        ),
+        "Social_Science": (
+            ("History", (
+                "history", "ancient", "medieval", "modern", "civilization",
+                "kingdom", "empire", "war", "independence",
+                "வரலாறு", "நாகரிகம்", "பேரரசு"
+            )),
+            ("Geography", (
+                "geography", "continent", "country", "river", "mountain",
+                "climate", "map", "ocean", "region",
+                "புவியியல்", "கண்டம்", "நாடு"
+            )),
+            ("Civics", (
+                "government", "democracy", "constitution", "rights",
+                "citizen", "parliament", "election", "law",
+                "அரசாங்கம்", "ஜனநாயகம்"
+            )),
+        ),
+    }
+    
+    def __init__(self):
+        self._sub_subject_automata = _build_sub_subject_automata(self.SUB_SUBJECT_KEYWORDS)
+    
     def extract_from_filename(self, filename: str) -> Dict[str, Any]:
         """
         Extract metadata from PDF filename.
@@ -39,6 +157,10 @@ class MetadataExtractor:
         Returns:
             Dictionary containing extracted metadata
         """
+        metadata = self._parse_standard_filename(filename)
+        if metadata is not None:
+            return metadata
+        
         metadata = {
             "subject": "Unknown",
             "sub_subject": "General",
@@ -48,34 +170,28 @@ class MetadataExtractor:
         }
         
         # Extract grade
-        grade_match = re.search(r'(\d+)(?:th|st|nd|rd)?[_\s]', filename, re.IGNORECASE)
+        grade_match = self._GRADE_RE.search(filename)
         if grade_match:
             metadata["grade"] = grade_match.group(1)
         
         # Extract subject
-        for subject, patterns in self.SUBJECT_PATTERNS.items():
-            for pattern in patterns:
-                if re.search(pattern, filename, re.IGNORECASE):
-                    metadata["subject"] = subject
-                    break
-            if metadata["subject"] != "Unknown":
+        for subject, pattern in self._SUBJECT_RES.items():
+            if pattern.search(filename):
+                metadata["subject"] = subject
                 break
         
         # Extract term
-        term_match = re.search(r'Term[_\s]*(I{1,3}|\d+)', filename, re.IGNORECASE)
+        term_match = self._TERM_RE.search(filename)
         if term_match:
             term = term_match.group(1)
             # Convert Roman numerals to Arabic
-            roman_to_arabic = {"I": "1", "II": "2", "III": "3"}
-            metadata["term"] = roman_to_arabic.get(term.upper(), term)
+            metadata["term"] = self._ROMAN_TO_ARABIC.get(term.upper(), term)
         
         # Extract language
-        for language, patterns in self.LANGUAGE_PATTERNS.items():
-            for pattern in patterns:
-                if re.search(pattern, filename):
-                    metadata["language"] = language
-                    break
-            if metadata["language"] != "English":
+        # English is the default, so its patterns never change the result
+        for language, pattern in self._LANGUAGE_RES.items():
+            if language != "English" and pattern.search(filename):
+                metadata["language"] = language
                 break
         
         # Detect sub-subject based on content keywords (will be refined during processing)
@@ -83,6 +199,76 @@ class MetadataExtractor:
         
         return metadata
     
+    def _parse_standard_filename(self, filename: str) -> Optional[Dict[str, Any]]:
+        """
+        Parse a filename that follows the standard naming with str.split.
+        
+        Handles names made only of a grade, a subject, optional "Std",
+        "Term" with its number and an EM/TM medium marker, e.g.
+        7th_Science_Term_II_EM.pdf or 7th_Std_Term_II_Maths_TM.pdf. The
+        result is the same as the regex path for these names.
+        
+        Args:
+            filename: Name of the PDF file
+            
+        Returns:
+            Metadata dictionary, or None if the name needs the regex path
+        """
+        if not filename.endswith(".pdf"):
+            return None
+        tokens = filename[:-4].split("_")
+        
+        grade = tokens[0]
+        if grade[-2:].lower() in self._ORDINAL_SUFFIXES:
+            grade = grade[:-2]
+        if not grade.isdecimal():
+            return None
+        
+        subject = None
+        term = "Unknown"
+        language = "English"
+        seen_term = False
+        i = 1
+        while i < len(tokens):
+            token = tokens[i]
+            key = token.lower()
+            if key == "social" and i + 1 < len(tokens) and tokens[i + 1].lower() == "science":
+                key = "socialscience"
+                i += 1
+            
+            if key in self._SUBJECT_TOKENS:
+                if subject is not None:
+                    return None  # Several subjects: leave the priority rules to the regexes
+                subject = self._SUBJECT_TOKENS[key]
+                if token == "Tamil":
+                    language = "Tamil"
+            elif token == "Term" and not seen_term and i + 1 < len(tokens):
+                number = tokens[i + 1]
+                if number.upper() in self._ROMAN_TO_ARABIC:
+                    term = self._ROMAN_TO_ARABIC[number.upper()]
+                elif number.isdecimal():
+                    term = number
+                else:
+                    return None
+                seen_term = True
+                i += 1
+            elif token == "TM":
+                language = "Tamil"
+            elif token != "EM" and token != "Std":
+                return None
+            i += 1
+        
+        if subject is None:
+            return None
+        
+        return {
+            "subject": subject,
+            "sub_subject": self._infer_sub_subject(subject),
+            "grade": grade,
+            "term": term,
+            "language": language
+        }
+    
     def _infer_sub_subject(self, subject: str) -> str:
         """
         Infer initial sub-subject based on main subject.
@@ -97,114 +283,49 @@ class MetadataExtractor:
         }
         return sub_subject_defaults.get(subject, "General")
     
-    def detect_sub_subject_from_content(self, text: str, subject: str) -> str:
+    def detect_sub_subject_from_content(
+        self,
+        text: str,
+        subject: str,
+        text_lower: Optional[str] = None
+    ) -> str:
         """
         Detect more specific sub-subject from content.
         
         Args:
             text: Text content
             subject: Main subject
+            text_lower: Optional text.lower(), if the caller already has it
             
         Returns:
             Detected sub-subject
         """
-        text_lower = text.lower()
+        sub_subjects = self.SUB_SUBJECT_KEYWORDS.get(subject)
+        if sub_subjects is None:
+            return self._infer_sub_subject(subject)
         
-        if subject == "Science":
-            # Physics keywords
-            physics_keywords = [
-                "force", "motion", "energy", "gravity", "velocity", 
-                "acceleration", "momentum", "wave", "light", "sound",
-                "விசை", "இயக்கம்", "ஆற்றல்"
-            ]
-            # Chemistry keywords
-            chemistry_keywords = [
-                "atom", "molecule", "element", "compound", "reaction",
-                "acid", "base", "chemical", "periodic", "bond",
-                "அணு", "மூலக்கூறு", "தனிமம்"
-            ]
-            # Biology keywords
-            biology_keywords = [
-                "cell", "organism", "plant", "animal", "photosynthesis",
-                "respiration", "digestion", "circulation", "nervous",
-                "செல்", "உயிரினம்", "தாவரம்"
-            ]
-            
-            physics_count = sum(1 for kw in physics_keywords if kw in text_lower)
-            chemistry_count = sum(1 for kw in chemistry_keywords if kw in text_lower)
-            biology_count = sum(1 for kw in biology_keywords if kw in text_lower)
-            
-            max_count = max(physics_count, chemistry_count, biology_count)
-            if max_count > 0:
-                if physics_count == max_count:
-                    return "Physics"
-                elif chemistry_count == max_count:
-                    return "Chemistry"
-                else:
-                    return "Biology"
+        if text_lower is None:
+            text_lower = text.lower()
         
-        elif subject == "Maths":
-            # Algebra keywords
-            algebra_keywords = [
-                "equation", "variable", "polynomial", "linear", "quadratic",
-                "சமன்பாடு", "மாறி"
-            ]
-            # Geometry keywords
-            geometry_keywords = [
-                "triangle", "circle", "angle", "area", "perimeter",
-                "முக்கோணம்", "வட்டம்", "பரப்பு"
-            ]
-            # Arithmetic keywords
-            arithmetic_keywords = [
-                "number", "fraction", "decimal", "percentage", "ratio",
-                "எண்", "பின்னம்", "விகிதம்"
-            ]
-            
-            algebra_count = sum(1 for kw in algebra_keywords if kw in text_lower)
-            geometry_count = sum(1 for kw in geometry_keywords if kw in text_lower)
-            arithmetic_count = sum(1 for kw in arithmetic_keywords if kw in text_lower)
-            
-            max_count = max(algebra_count, geometry_count, arithmetic_count)
-            if max_count > 0:
-                if algebra_count == max_count:
-                    return "Algebra"
-                elif geometry_count == max_count:
-                    return "Geometry"
-                else:
-                    return "Arithmetic"
+        # Count distinct keywords present for each sub-subject
+        automaton = self._sub_subject_automata.get(subject)
+        if automaton is not None:
+            counts = [0] * len(sub_subjects)
+            # A set keeps repeated keywords counted once
+            for _, indices in {value for _, value in automaton.iter(text_lower)}:
+                for index in indices:
+                    counts[index] += 1
+        else:
+            counts = [sum(1 for kw in keywords if kw in text_lower) for _, keywords in sub_subjects]
         
-        elif subject == "Social_Science":
-            # History keywords
-            history_keywords = [
-                "history", "ancient", "medieval", "modern", "civilization",
-                "kingdom", "empire", "war", "independence",
-                "வரலாறு", "நாகரிகம்", "பேரரசு"
-            ]
-            # Geography keywords
-            geography_keywords = [
-                "geography", "continent", "country", "river", "mountain",
-                "climate", "map", "ocean", "region",
-                "புவியியல்", "கண்டம்", "நாடு"
-            ]
-            # Civics keywords
-            civics_keywords = [
-                "government", "democracy", "constitution", "rights",
-                "citizen", "parliament", "election", "law",
-                "அரசாங்கம்", "ஜனநாயகம்"
-            ]
-            
-            history_count = sum(1 for kw in history_keywords if kw in text_lower)
-            geography_count = sum(1 for kw in geography_keywords if kw in text_lower)
-            civics_count = sum(1 for kw in civics_keywords if kw in text_lower)
-            
-            max_count = max(history_count, geography_count, civics_count)
-            if max_count > 0:
-                if history_count == max_count:
-                    return "History"
-                elif geography_count == max_count:
-                    return "Geography"
-                else:
-                    return "Civics"
+        # On a tie the earlier sub-subject wins
+        best_label, best_count = None, 0
+        for (label, _), count in zip(sub_subjects, counts):
+            if count > best_count:
+                best_label, best_count = label, count
+        
+        if best_label is not None:
+            return best_label
         
         return self._infer_sub_subject(subject)
     
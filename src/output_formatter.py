@@ -4,17 +4,181 @@ Formats RAG responses into structured JSON based on subject type.
 """
 import json
 import re
+from functools import lru_cache
 from typing import Dict, Any, List, Optional
 
+# Optional: orjson parses and serializes nested responses several times faster
+# and writes UTF-8 (Tamil) directly
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Patterns for reading LLM output, compiled once at import
+# Characters that matter when matching braces in JSON (strings and escapes included)
+_JSON_STRUCTURE_RE = re.compile(r'[{}"\\]')
+# Start of the summary value in a streamed general response, and the body of
+# a JSON string up to its closing quote (or the end of the text so far)
+_SUMMARY_START_RE = re.compile(r'"summary"\s*:\s*"')
+_JSON_STRING_BODY_RE = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+# Sentence bodies between sentence-ending punctuation
+_SENTENCE_RE = re.compile(r'[^.!?]+')
+# Sentences used by the plain-text fallback: one summary plus up to four points
+_FALLBACK_SENTENCES = 5
+# Step markers ("Step 2:", "3.", "4)") in a plain-text math solution. The
+# lookbehind keeps the scan from re-reading long digit runs from every digit.
+_STEP_MARKER_RE = re.compile(r'(?:Step\s*)?(?<!\d)(\d+)[.:\)]', re.IGNORECASE)
+_LEADING_SPACE_RE = re.compile(r'\s*')
+_ANSWER_RE = re.compile(r'(?:answer|result|solution)[:\s]*(.+?)(?:[.\n]|$)', re.IGNORECASE)
+_CAPTION_QUESTION_WORDS = frozenset(
+    ('what', 'how', 'why', 'explain', 'describe', 'solve', 'find', 'calculate')
+)
+# Fallback for the cases the word split can't decide: a single word, leading
+# whitespace, or a non-ASCII first word (case folding also matches "ſolve")
+_CAPTION_QUESTION_WORD_RE = re.compile(
+    r'^(what|how|why|explain|describe|solve|find|calculate)\s+', re.IGNORECASE
+)
+
+
+def _matching_brace(text: str, start: int) -> int:
+    """
+    Find the brace that closes the JSON object opened at text[start].
+    
+    Braces inside JSON strings are ignored. The scan jumps between
+    structural characters instead of visiting every character.
+    
+    Args:
+        text: Text containing the object
+        start: Index of the opening brace
+        
+    Returns:
+        Index of the closing brace, or -1 if the object is never closed
+    """
+    depth = 0
+    in_string = False
+    skip_to = -1
+    for match in _JSON_STRUCTURE_RE.finditer(text, start):
+        pos = match.start()
+        if pos < skip_to:
+            continue  # Character escaped by a backslash
+        char = match.group()
+        if in_string:
+            if char == '\\':
+                skip_to = pos + 2
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return pos
+    return -1
+
+
+@lru_cache(maxsize=128)
+def _caption_from_query(query: str) -> str:
+    """
+    Build a short title from a query (memoized; queries repeat across retries).
+    
+    Args:
+        query: User query
+        
+    Returns:
+        Caption of at most 50 characters plus an ellipsis
+    """
+    # Remove a leading question word and clean up
+    parts = query.split(None, 1)
+    if len(parts) == 2 and parts[0].isascii() and not query[:1].isspace():
+        caption = parts[1] if parts[0].lower() in _CAPTION_QUESTION_WORDS else query
+    else:
+        caption = _CAPTION_QUESTION_WORD_RE.sub('', query)
+    # Drop one trailing "?" (also when it is followed by a final newline)
+    if caption.endswith('?'):
+        caption = caption[:-1]
+    elif caption.endswith('?\n'):
+        caption = caption[:-2]
+    caption = caption.strip().title()
+    
+    if len(caption) > 50:
+        caption = caption[:50] + "..."
+    
+    return caption if caption else "Response"
+
+
+def _norm_step(step: Dict[str, Any], number: int) -> Dict[str, Any]:
+    """Fill in missing fields of one solution step, numbering it by position if needed."""
+    return {
+        "step_number": step.get("step_number", number),
+        "action": step.get("action", ""),
+        "explanation": step.get("explanation", ""),
+        "expression": step.get("expression", ""),
+        "result": step.get("result", "")
+    }
+
+
+def _split_steps(text: str) -> List[str]:
+    """
+    Split a plain-text solution into the text of its numbered steps.
+    
+    Each step runs from its marker to the next marker (or the end of the
+    text). Markers are found in one pass and the steps sliced between them,
+    so long outputs never trigger regex backtracking.
+    
+    Args:
+        text: Plain-text LLM output
+        
+    Returns:
+        Stripped step texts, in order (empty if the text has no markers)
+    """
+    markers = list(_STEP_MARKER_RE.finditer(text))
+    index = 0
+    
+    def next_marker(pos: int) -> int:
+        """Earliest position >= pos where a step marker begins."""
+        nonlocal index
+        while index < len(markers):
+            marker = markers[index]
+            if marker.start() >= pos:
+                return marker.start()
+            if pos < marker.end(1):
+                return max(pos, marker.start(1))  # Any digit of the number starts a marker
+            index += 1
+        return len(text)
+    
+    steps = []
+    pos = next_marker(0)
+    while pos < len(text):
+        marker_end = markers[index].end()
+        start = _LEADING_SPACE_RE.match(text, marker_end).end()
+        if start == len(text):
+            if start == marker_end:
+                break  # Marker at the very end has no step text
+            start -= 1  # Whitespace-only step, kept as an empty step
+        # Steps hold at least one character, then stop at the next marker
+        end = next_marker(start + 1)
+        steps.append(text[start:end].strip())
+        pos = next_marker(end)
+    return steps
+
+
+def _loads(text: str) -> Any:
+    """Parse JSON text, using orjson when available."""
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass  # Let the stdlib parser decide (it also accepts NaN/Infinity)
+    return json.loads(text)
+
 
 class OutputFormatter:
     """Formats responses into structured JSON based on subject."""
     
-    def __init__(self):
-        pass
-    
+    @staticmethod
     def format_general_response(
-        self,
         response_text: str,
         query: str,
         subject: str
@@ -30,27 +194,16 @@ class OutputFormatter:
         Returns:
             Structured JSON response
         """
-        # Try to parse as JSON first
-        try:
-            parsed = json.loads(response_text)
-            return self._validate_general_schema(parsed)
-        except json.JSONDecodeError:
-            pass
-        
-        # If not valid JSON, try to extract JSON from the response
-        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-        if json_match:
-            try:
-                parsed = json.loads(json_match.group())
-                return self._validate_general_schema(parsed)
-            except json.JSONDecodeError:
-                pass
+        # Parse the JSON object, directly or from within surrounding text
+        parsed = OutputFormatter._parse_json_object(response_text)
+        if parsed is not None:
+            return OutputFormatter._validate_general_schema(parsed)
         
         # Fallback: Create structured response from plain text
-        return self._create_general_from_text(response_text, query)
+        return OutputFormatter._create_general_from_text(response_text, query)
     
+    @staticmethod
     def format_math_response(
-        self,
         response_text: str,
         query: str
     ) -> Dict[str, Any]:
@@ -64,86 +217,106 @@ class OutputFormatter:
         Returns:
             Structured JSON with steps
         """
-        # Try to parse as JSON first
+        # Parse the JSON object, directly or from within surrounding text
+        parsed = OutputFormatter._parse_json_object(response_text)
+        if parsed is not None:
+            return OutputFormatter._validate_math_schema(parsed)
+        
+        # Fallback: Create structured response from plain text
+        return OutputFormatter._create_math_from_text(response_text, query)
+    
+    @staticmethod
+    def _parse_json_object(response_text: str) -> Optional[Dict[str, Any]]:
+        """
+        Parse the LLM output as a JSON object.
+        
+        Args:
+            response_text: Raw response from LLM
+            
+        Returns:
+            Parsed object, or None if no JSON object could be read
+        """
         try:
-            parsed = json.loads(response_text)
-            return self._validate_math_schema(parsed)
+            parsed = _loads(response_text)
         except json.JSONDecodeError:
-            pass
-        
-        # If not valid JSON, try to extract JSON from the response
-        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-        if json_match:
+            # Not valid JSON as a whole; try the span from the first "{" to
+            # the last "}" (plain string searches, no regex scan needed)
+            start = response_text.find('{')
+            end = response_text.rfind('}')
+            if start == -1 or end < start:
+                return None
             try:
-                parsed = json.loads(json_match.group())
-                return self._validate_math_schema(parsed)
+                parsed = _loads(response_text[start:end + 1])
             except json.JSONDecodeError:
-                pass
+                # Prose after the object may hold braces too; cut at the
+                # brace that actually closes the first object
+                end = _matching_brace(response_text, start)
+                if end == -1:
+                    return None
+                try:
+                    parsed = _loads(response_text[start:end + 1])
+                except json.JSONDecodeError:
+                    return None
         
-        # Fallback: Create structured response from plain text
-        return self._create_math_from_text(response_text, query)
+        # Arrays and scalars are valid JSON but not a response object
+        return parsed if isinstance(parsed, dict) else None
+    
+    # The validators spell out each schema's fields and defaults directly
+    # (config's *_OUTPUT_SCHEMA dicts are not walked at runtime), so every
+    # call is one dict build with no per-field dispatch
     
-    def _validate_general_schema(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    @staticmethod
+    def _validate_general_schema(data: Dict[str, Any]) -> Dict[str, Any]:
         """Validate and normalize general response schema."""
-        result = {
+        points = data.get("bullet_points")
+        table = data.get("table")
+        return {
             "summary": data.get("summary", ""),
             "caption": data.get("caption", "Response"),
-            "bullet_points": [],
-            "table": []
+            # Dict points are kept as-is, plain strings are wrapped, anything else is dropped
+            "bullet_points": [
+                point if isinstance(point, dict) else {"point": point}
+                for point in points
+                if isinstance(point, (dict, str))
+            ] if isinstance(points, list) else [],
+            "table": table if isinstance(table, list) else []
         }
-        
-        # Process bullet points
-        if "bullet_points" in data:
-            for point in data["bullet_points"]:
-                if isinstance(point, dict):
-                    result["bullet_points"].append(point)
-                elif isinstance(point, str):
-                    result["bullet_points"].append({"point": point})
-        
-        # Process table
-        if "table" in data and isinstance(data["table"], list):
-            result["table"] = data["table"]
-        
-        return result
     
-    def _validate_math_schema(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    @staticmethod
+    def _validate_math_schema(data: Dict[str, Any]) -> Dict[str, Any]:
         """Validate and normalize math response schema."""
-        result = {
+        steps = data.get("steps")
+        return {
             "problem": data.get("problem", ""),
             "caption": data.get("caption", "Math Solution"),
-            "steps": [],
+            "steps": [
+                _norm_step(step, i)
+                for i, step in enumerate(steps, 1)
+                if isinstance(step, dict)
+            ] if isinstance(steps, list) else [],
             "final_answer": data.get("final_answer", ""),
             "concept_used": data.get("concept_used", []),
             "tips": data.get("tips", [])
         }
-        
-        # Process steps
-        if "steps" in data:
-            for i, step in enumerate(data["steps"], 1):
-                if isinstance(step, dict):
-                    validated_step = {
-                        "step_number": step.get("step_number", i),
-                        "action": step.get("action", ""),
-                        "explanation": step.get("explanation", ""),
-                        "expression": step.get("expression", ""),
-                        "result": step.get("result", "")
-                    }
-                    result["steps"].append(validated_step)
-        
-        return result
     
-    def _create_general_from_text(self, text: str, query: str) -> Dict[str, Any]:
+    @staticmethod
+    def _create_general_from_text(text: str, query: str) -> Dict[str, Any]:
         """Create general response structure from plain text."""
-        # Split text into sentences for bullet points
-        sentences = re.split(r'[.!?]', text)
-        sentences = [s.strip() for s in sentences if s.strip()]
+        # Split text into sentences for bullet points, stopping once enough are found
+        sentences = []
+        for match in _SENTENCE_RE.finditer(text):
+            sentence = match.group().strip()
+            if sentence:
+                sentences.append(sentence)
+                if len(sentences) == _FALLBACK_SENTENCES:
+                    break
         
         # First sentence as summary, rest as bullet points
         summary = sentences[0] if sentences else text
-        bullet_points = [{"point": s} for s in sentences[1:5]]  # Max 5 points
+        bullet_points = [{"point": s} for s in sentences[1:_FALLBACK_SENTENCES]]
         
         # Generate caption from query
-        caption = self._generate_caption(query)
+        caption = OutputFormatter._generate_caption(query)
         
         return {
             "summary": summary,
@@ -152,29 +325,21 @@ class OutputFormatter:
             "table": []
         }
     
-    def _create_math_from_text(self, text: str, query: str) -> Dict[str, Any]:
+    @staticmethod
+    def _create_math_from_text(text: str, query: str) -> Dict[str, Any]:
         """Create math response structure from plain text."""
         # Try to extract steps from numbered patterns
-        step_patterns = [
-            r'(?:Step\s*)?(\d+)[.:\)]\s*(.+?)(?=(?:Step\s*)?\d+[.:\)]|$)',
-            r'(\d+)\.\s*(.+?)(?=\d+\.|$)',
+        steps = [
+            {
+                "step_number": i,
+                "action": f"Step {i}",
+                "explanation": step_text,
+                "expression": "",
+                "result": ""
+            }
+            for i, step_text in enumerate(_split_steps(text), 1)
         ]
         
-        steps = []
-        for pattern in step_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE | re.DOTALL)
-            if matches:
-                for i, match in enumerate(matches, 1):
-                    step_text = match[1].strip() if len(match) > 1 else match[0].strip()
-                    steps.append({
-                        "step_number": i,
-                        "action": f"Step {i}",
-                        "explanation": step_text,
-                        "expression": "",
-                        "result": ""
-                    })
-                break
-        
         # If no steps found, create a single step
         if not steps:
             steps = [{
@@ -186,39 +351,69 @@ class OutputFormatter:
             }]
         
         # Try to extract final answer
-        answer_match = re.search(r'(?:answer|result|solution)[:\s]*(.+?)(?:[.\n]|$)', text, re.IGNORECASE)
+        answer_match = _ANSWER_RE.search(text)
         final_answer = answer_match.group(1).strip() if answer_match else ""
         
         return {
             "problem": query,
-            "caption": self._generate_caption(query),
+            "caption": OutputFormatter._generate_caption(query),
             "steps": steps,
             "final_answer": final_answer,
             "concept_used": [],
             "tips": []
         }
     
-    def _generate_caption(self, query: str) -> str:
+    @staticmethod
+    def _generate_caption(query: str) -> str:
         """Generate a caption from the query."""
-        # Remove question words and clean up
-        caption = re.sub(r'^(what|how|why|explain|describe|solve|find|calculate)\s+', '', query, flags=re.IGNORECASE)
-        caption = re.sub(r'\?$', '', caption)
-        caption = caption.strip().title()
+        return _caption_from_query(query)
+    
+    @staticmethod
+    def partial_summary(text: str) -> Optional[str]:
+        """
+        Decode the summary from a general response that is still streaming.
         
-        if len(caption) > 50:
-            caption = caption[:50] + "..."
+        Args:
+            text: JSON text received so far
+            
+        Returns:
+            Summary text so far (complete once its closing quote arrived),
+            or None before the summary field starts
+        """
+        start = _SUMMARY_START_RE.search(text)
+        if start is None:
+            return None
         
-        return caption if caption else "Response"
+        raw = _JSON_STRING_BODY_RE.match(text, start.end()).group()
+        # An escape sequence can be cut off mid-stream; drop it until it completes
+        for cut in range(len(raw), max(len(raw) - 6, -1), -1):
+            try:
+                summary = json.loads(f'"{raw[:cut]}"', strict=False)
+                break
+            except ValueError:
+                continue
+        else:
+            return None
+        
+        if summary and '\ud800' <= summary[-1] <= '\udbff':
+            summary = summary[:-1]  # High surrogate waiting for its pair
+        return summary
     
-    def to_json_string(self, response: Dict[str, Any], indent: int = 2) -> str:
+    @staticmethod
+    def to_json_string(response: Dict[str, Any], indent: int = 2) -> str:
         """Convert response to formatted JSON string."""
+        if orjson is not None and indent == 2:
+            try:
+                return orjson.dumps(
+                    response, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+                ).decode()
+            except TypeError:
+                pass  # Unsupported value type; the stdlib encoder handles the rest
         return json.dumps(response, indent=indent, ensure_ascii=False)
 
 
 if __name__ == "__main__":
     # Test the output formatter
-    formatter = OutputFormatter()
-    
     # Test general response
     general_text = """
     {
@@ -232,9 +427,9 @@ if __name__ == "__main__":
     }
     """
     
-    result = formatter.format_general_response(general_text, "What are properties of alcohol?", "Science")
+    result = OutputFormatter.format_general_response(general_text, "What are properties of alcohol?", "Science")
     print("General response:")
-    print(formatter.to_json_string(result))
+    print(OutputFormatter.to_json_string(result))
     
     # Test math response
     math_text = """
@@ -256,6 +451,6 @@ if __name__ == "__main__":
     }
     """
     
-    result = formatter.format_math_response(math_text, "Solve: 2x + 5 = 15")
+    result = OutputFormatter.format_math_response(math_text, "Solve: 2x + 5 = 15")
     print("\nMath response:")
-    print(formatter.to_json_string(result))
+    print(OutputFormatter.to_json_string(result))
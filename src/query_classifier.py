@@ -3,7 +3,9 @@ Query Classifier Module
 Classifies user queries by subject and builds metadata filters.
 """
 import re
-from typing import Dict, Any, Optional, List, Tuple
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Any, Optional, List, Tuple, Iterable
 from pathlib import Path
 
 import sys
@@ -11,12 +13,234 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from config import SUBJECTS, SUBJECT_KEYWORDS
 
+# Optional: pyahocorasick scans all subject keywords in a single pass
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Query patterns, built once at import and matched against the normalized query.
+# Plain words are checked with substring tests, which run in C and stop at the
+# first hit; only the number/variable forms need a regex, fused into one pattern.
+# Invariant: every keyword and pattern below is lowercase and compiled without
+# re.IGNORECASE, so callers must pass the query through _normalize_text first.
+
+# Heuristic math detection - numbers, equations, mathematical terms
+_MATH_HEURISTIC_KEYWORDS = (
+    'solve',
+    'calculate',
+    'equation',
+    'how many',
+    'find the value',
+)
+_MATH_HEURISTIC_RE = re.compile(
+    r'\d+\s*[\+\-\*\/\=]\s*\d+'  # Basic operations
+    r'|x\s*[\+\-\*\/\=]'  # Variable equations
+)
+
+# Heuristic science detection - ONLY specific science patterns, not generic ones
+_SCIENCE_HEURISTIC_KEYWORDS = (
+    'photosynthesis',
+    'chemical',
+    'physical properties',
+    'reaction',
+    'experiment',
+    'organism',
+    'cell structure',
+)
+
+# Words indicating a math problem that needs a step-by-step solution
+_MATH_PROBLEM_KEYWORDS = (
+    # English patterns
+    'solve',
+    'calculate',
+    'find the value',
+    'evaluate',
+    'simplify',
+    'factorize',
+    'prove that',
+    'area of',
+    'perimeter of',
+    'sum of',
+    'product of',
+    'how many',
+    'how much',
+    'what is the',
+    'total',
+    'ratio',
+    'proportion',
+    
+    # Tamil math problem indicators
+    'கணக்கிடு',  # Calculate
+    'தீர்க்க',  # Solve
+    'கண்டுபிடி',  # Find
+    'எத்தனை',  # How many/much
+    'எவ்வளவு',  # How much
+    'மொத்தம்',  # Total
+    'தேவைப்படும்',  # Required/needed
+    'அளவு',  # Quantity/amount
+    'கலவை',  # Mixture
+    'விகிதம்',  # Ratio
+    'சதவீதம்',  # Percentage
+    'பெற',  # To get/obtain
+)
+# Numbers followed by an operator or unit, and equations with variables
+_MATH_PROBLEM_RE = re.compile(
+    r'\d+\s*(?:'
+    r'[\+\-\*\/\=]'  # Equations with numbers
+    r'|%|percent|சதவீதம்'  # Percentages (works for any language)
+    r'|grams?|kg|cm|meters?'  # Unit patterns (quantity problems)
+    r'|கிராம்|கிலோ|மீட்டர்|செமீ'  # Tamil grams, kilo, meter, cm
+    r')'
+    r'|x\s*[\+\-\*\/\=]'  # Equations with variables
+)
+
+_WORD_RE = re.compile(r'\b\w+\b')
+# Maps every ASCII character outside \w to a space, so split() yields the
+# same words as _WORD_RE for ASCII text
+_ASCII_NON_WORD_TO_SPACE = str.maketrans({
+    char: ' ' for char in map(chr, range(128)) if not (char.isalnum() or char == '_')
+})
+
+# Common words dropped from topic hints
+_STOP_WORDS = frozenset({
+    'what', 'is', 'are', 'the', 'of', 'in', 'a', 'an', 'how', 'why',
+    'explain', 'describe', 'tell', 'me', 'about', 'give', 'list',
+    'என்ன', 'எப்படி', 'ஏன்', 'பற்றி'  # Tamil stop words
+})
+
+
+# Recent queries whose normalization and classification results are memoized
+_QUERY_CACHE_SIZE = 128
+
+
+@lru_cache(maxsize=_QUERY_CACHE_SIZE)
+def _normalize_text(text: str) -> str:
+    """
+    NFC-normalize and casefold text so composed and decomposed Tamil forms compare equal.
+    
+    Cached so subject classification, the heuristics and math detection
+    normalize each query once between them.
+    """
+    return unicodedata.normalize("NFC", text).casefold()
+
+
+def _build_literal_automaton(keywords: Iterable[str]):
+    """
+    Compile keywords into an Aho-Corasick automaton for any-match checks.
+    
+    Args:
+        keywords: Literal keywords
+        
+    Returns:
+        Automaton, or None if pyahocorasick is unavailable
+    """
+    if ahocorasick is None:
+        return None
+    
+    automaton = ahocorasick.Automaton()
+    for keyword in keywords:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+
+def _contains_any(text: str, keywords: Tuple[str, ...], automaton) -> bool:
+    """Check whether any keyword occurs in text, in one automaton pass when available."""
+    if automaton is not None:
+        return next(automaton.iter(text), None) is not None
+    return any(keyword in text for keyword in keywords)
+
+
+# One pass over the query finds any keyword of each list
+_MATH_HEURISTIC_AUTOMATON = _build_literal_automaton(_MATH_HEURISTIC_KEYWORDS)
+_SCIENCE_HEURISTIC_AUTOMATON = _build_literal_automaton(_SCIENCE_HEURISTIC_KEYWORDS)
+_MATH_PROBLEM_AUTOMATON = _build_literal_automaton(_MATH_PROBLEM_KEYWORDS)
+
+
+@lru_cache(maxsize=_QUERY_CACHE_SIZE)
+def _is_math_query(query: str) -> bool:
+    """Check a query against the math-problem keywords and patterns (memoized)."""
+    query_lower = _normalize_text(query)
+    return (
+        _contains_any(query_lower, _MATH_PROBLEM_KEYWORDS, _MATH_PROBLEM_AUTOMATON)
+        or _MATH_PROBLEM_RE.search(query_lower) is not None
+    )
+
+
+def _build_keyword_automaton(subject_keywords: Dict[str, Iterable[str]]):
+    """
+    Compile every subject keyword into one Aho-Corasick automaton.
+    
+    Args:
+        subject_keywords: Mapping of subject to keyword list
+        
+    Returns:
+        Automaton whose values are (keyword, subjects), or None if unavailable
+    """
+    if ahocorasick is None:
+        return None
+    
+    owners: Dict[str, List[str]] = {}
+    for subject, keywords in subject_keywords.items():
+        for keyword in keywords:
+            owners.setdefault(keyword, []).append(subject)
+    
+    automaton = ahocorasick.Automaton()
+    for keyword, subjects in owners.items():
+        automaton.add_word(keyword, (keyword, tuple(subjects)))
+    automaton.make_automaton()
+    return automaton
+
 
 class QueryClassifier:
     """Classifies queries to determine subject and build metadata filters."""
     
     def __init__(self):
-        self.subject_keywords = SUBJECT_KEYWORDS
+        # Keywords normalized once; queries get the same treatment before matching
+        self.subject_keywords = {
+            subject: frozenset(_normalize_text(keyword) for keyword in keywords)
+            for subject, keywords in SUBJECT_KEYWORDS.items()
+        }
+        self._keyword_automaton = _build_keyword_automaton(self.subject_keywords)
+        # Tamil keywords can never occur in an ASCII query, so those skip them
+        self._ascii_subject_keywords = {
+            subject: frozenset(keyword for keyword in keywords if keyword.isascii())
+            for subject, keywords in self.subject_keywords.items()
+        }
+        # Per-instance memo, since scoring depends on this instance's keywords
+        # (a class-level lru_cache would also keep every instance alive)
+        self._classify_cached = lru_cache(maxsize=_QUERY_CACHE_SIZE)(self._classify_subject)
+    
+    def _score_keywords(self, query_lower: str) -> Dict[str, int]:
+        """
+        Count distinct keyword matches per subject.
+        
+        Args:
+            query_lower: Normalized, casefolded user query
+            
+        Returns:
+            Dictionary mapping subjects to number of matched keywords
+        """
+        # Keywords are normalized once in __init__; only the counters are per call
+        scores = dict.fromkeys(self.subject_keywords, 0)
+        
+        if self._keyword_automaton is not None:
+            # Single pass over the query; a set keeps repeated keywords counted once
+            matched = {value for _, value in self._keyword_automaton.iter(query_lower)}
+            for _, subjects in matched:
+                for subject in subjects:
+                    scores[subject] += 1
+            return scores
+        
+        subject_keywords = (
+            self._ascii_subject_keywords if query_lower.isascii() else self.subject_keywords
+        )
+        for subject, keywords in subject_keywords.items():
+            for keyword in keywords:
+                if keyword in query_lower:
+                    scores[subject] += 1
+        return scores
     
     def classify_subject(self, query: str) -> Tuple[str, float]:
         """
@@ -28,25 +252,28 @@ class QueryClassifier:
         Returns:
             Tuple of (subject, confidence_score)
         """
-        query_lower = query.lower()
+        return self._classify_cached(query)
+    
+    def _classify_subject(self, query: str) -> Tuple[str, float]:
+        """Classify a query without the memo; see classify_subject."""
+        query_lower = _normalize_text(query)
         
         # Count keyword matches for each subject
-        scores = {}
-        for subject, keywords in self.subject_keywords.items():
-            score = 0
-            for keyword in keywords:
-                if keyword.lower() in query_lower:
-                    score += 1
-            scores[subject] = score
+        scores = self._score_keywords(query_lower)
         
-        # Find the subject with highest score
-        if max(scores.values()) == 0:
+        # Find the subject with highest score (the first one on a tie) and
+        # the total number of matches in a single pass
+        best_subject, best_score, total_matches = None, 0, 0
+        for subject, score in scores.items():
+            total_matches += score
+            if score > best_score:
+                best_subject, best_score = subject, score
+        
+        if best_score == 0:
             # No keywords matched, use heuristics
             return self._classify_by_heuristics(query)
         
-        best_subject = max(scores, key=scores.get)
-        total_matches = sum(scores.values())
-        confidence = scores[best_subject] / total_matches if total_matches > 0 else 0
+        confidence = best_score / total_matches
         
         return best_subject, confidence
     
@@ -61,32 +288,15 @@ class QueryClassifier:
             Tuple of (subject, confidence_score)
             Returns (None, 0) if no confident classification can be made
         """
-        query_lower = query.lower()
+        query_lower = _normalize_text(query)
         
         # Math detection - look for numbers, equations, mathematical terms
-        math_patterns = [
-            r'\d+\s*[\+\-\*\/\=]\s*\d+',  # Basic operations
-            r'solve',
-            r'calculate',
-            r'equation',
-            r'how many',
-            r'find the value',
-            r'x\s*[\+\-\*\/\=]',  # Variable equations
-        ]
-        if any(re.search(pattern, query_lower) for pattern in math_patterns):
+        if (_contains_any(query_lower, _MATH_HEURISTIC_KEYWORDS, _MATH_HEURISTIC_AUTOMATON)
+                or _MATH_HEURISTIC_RE.search(query_lower)):
             return "Maths", 0.7
         
         # Science detection - ONLY specific science patterns, not generic ones
-        science_patterns = [
-            r'photosynthesis',
-            r'chemical',
-            r'physical properties',
-            r'reaction',
-            r'experiment',
-            r'organism',
-            r'cell structure',
-        ]
-        if any(re.search(pattern, query_lower) for pattern in science_patterns):
+        if _contains_any(query_lower, _SCIENCE_HEURISTIC_KEYWORDS, _SCIENCE_HEURISTIC_AUTOMATON):
             return "Science", 0.6
         
         # Return None to indicate no confident classification - will search all subjects
@@ -102,62 +312,7 @@ class QueryClassifier:
         Returns:
             True if it's a math problem
         """
-        query_lower = query.lower()
-        
-        # Patterns indicating a math problem
-        problem_patterns = [
-            # English patterns
-            r'solve',
-            r'calculate',
-            r'find the value',
-            r'evaluate',
-            r'simplify',
-            r'factorize',
-            r'prove that',
-            r'\d+\s*[\+\-\*\/\=]',  # Equations with numbers
-            r'x\s*[\+\-\*\/\=]',  # Equations with variables
-            r'area of',
-            r'perimeter of',
-            r'sum of',
-            r'product of',
-            r'how many',
-            r'how much',
-            r'what is the',
-            r'total',
-            r'ratio',
-            r'proportion',
-            
-            # Percentage patterns (works for any language)
-            r'\d+\s*%',  # Numbers with percentage symbol
-            r'\d+\s*percent',
-            r'\d+\s*சதவீதம்',  # Tamil percentage
-            
-            # Unit patterns (quantity problems)
-            r'\d+\s*grams?',
-            r'\d+\s*kg',
-            r'\d+\s*cm',
-            r'\d+\s*meters?',
-            r'\d+\s*கிராம்',  # Tamil grams
-            r'\d+\s*கிலோ',  # Tamil kilo
-            r'\d+\s*மீட்டர்',  # Tamil meter
-            r'\d+\s*செமீ',  # Tamil cm
-            
-            # Tamil math problem indicators
-            r'கணக்கிடு',  # Calculate
-            r'தீர்க்க',  # Solve
-            r'கண்டுபிடி',  # Find
-            r'எத்தனை',  # How many/much
-            r'எவ்வளவு',  # How much
-            r'மொத்தம்',  # Total
-            r'தேவைப்படும்',  # Required/needed
-            r'அளவு',  # Quantity/amount
-            r'கலவை',  # Mixture
-            r'விகிதம்',  # Ratio
-            r'சதவீதம்',  # Percentage
-            r'பெற',  # To get/obtain
-        ]
-        
-        return any(re.search(pattern, query_lower) for pattern in problem_patterns)
+        return _is_math_query(query)
     
     def build_metadata_filter(
         self, 
@@ -202,14 +357,13 @@ class QueryClassifier:
             List of potential topic keywords
         """
         # Remove common words
-        stop_words = {
-            'what', 'is', 'are', 'the', 'of', 'in', 'a', 'an', 'how', 'why',
-            'explain', 'describe', 'tell', 'me', 'about', 'give', 'list',
-            'என்ன', 'எப்படி', 'ஏன்', 'பற்றி'  # Tamil stop words
-        }
-        
-        words = re.findall(r'\b\w+\b', query.lower())
-        topic_hints = [w for w in words if w not in stop_words and len(w) > 2]
+        query_lower = _normalize_text(query)
+        if query_lower.isascii():
+            words = query_lower.translate(_ASCII_NON_WORD_TO_SPACE).split()
+        else:
+            # Tamil words (and their combining marks) need the Unicode-aware regex
+            words = _WORD_RE.findall(query_lower)
+        topic_hints = [w for w in words if w not in _STOP_WORDS and len(w) > 2]
         
         return topic_hints
 
@@ -3,48 +3,83 @@ RAG Chain Module
 Main RAG pipeline combining retrieval and generation.
 """
 import json
-from typing import Dict, Any, List, Optional
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Generator, List, Optional, Tuple
 from pathlib import Path
 
-import ollama
+import numpy as np
 
 import sys
 sys.path.append(str(Path(__file__).parent.parent))
 
 from config import (
-    LLM_MODEL, OLLAMA_BASE_URL, TOP_K_RESULTS,
-    GENERAL_SYSTEM_PROMPT, MATH_SYSTEM_PROMPT
+    LLM_MODEL, LLM_PRELOAD, OLLAMA_KEEP_ALIVE,
+    LLM_NUM_CTX, GENERAL_NUM_PREDICT, MATH_NUM_PREDICT,
+    TOP_K_RESULTS, CONTEXT_MMR_LAMBDA, CONTEXT_DEDUP_THRESHOLD,
+    SEMANTIC_CACHE_ENABLED, EMBEDDING_CACHE_SIZE,
+    GENERAL_PROMPT_TEMPLATE, MATH_PROMPT_TEMPLATE
 )
 from src.vector_store import VectorStore
+from src.semantic_cache import SemanticCache
 from src.language_detector import LanguageDetector
 from src.query_classifier import QueryClassifier
 from src.output_formatter import OutputFormatter
 
+# A document cut at the context limit is kept only if this much of its text fits
+MIN_PARTIAL_CONTEXT_CHARS = 200
+
+# Answer tokens always left free in the context window; retrieved context is
+# trimmed to fit around them
+MIN_NUM_PREDICT = 256
+
+# Options that decide how Ollama loads the model. Every generate call, the
+# preload included, must send the same values or Ollama reloads the model.
+MODEL_LOAD_OPTIONS = {"num_ctx": LLM_NUM_CTX}
+
 
 class RAGChain:
     """Main RAG pipeline for the school tutor system."""
     
-    def __init__(self, vector_store: Optional[VectorStore] = None):
+    def __init__(
+        self,
+        vector_store: Optional[VectorStore] = None,
+        use_cache: bool = SEMANTIC_CACHE_ENABLED
+    ):
         """
         Initialize the RAG chain.
         
         Args:
             vector_store: Optional pre-initialized vector store
+            use_cache: Whether to answer near-duplicate questions from the semantic cache
         """
         self.vector_store = vector_store or VectorStore()
         self.language_detector = LanguageDetector()
         self.query_classifier = QueryClassifier()
-        self.output_formatter = OutputFormatter()
+        self.output_formatter = OutputFormatter  # Stateless; all methods are static
+        self.semantic_cache = SemanticCache() if use_cache else None
+        
+        # LRU of query embeddings: (embedding model, text) -> read-only vector
+        self._embedding_cache: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        # The chain is shared across app sessions, so LRU updates must not interleave
+        self._embedding_cache_lock = threading.Lock()
         
-        # Initialize Ollama client
-        self.ollama_client = ollama.Client(host=OLLAMA_BASE_URL)
+        # Share the vector store's Ollama client so embedding and generation
+        # calls reuse one pool of keep-alive connections
+        self.ollama_client = self.vector_store.ollama_client
         self.llm_model = LLM_MODEL
+        
+        # Background thread that loads the LLM while retrieval runs
+        self._preload_executor = ThreadPoolExecutor(max_workers=1) if LLM_PRELOAD else None
+        self._preload: Optional[Future] = None
     
     def query(
         self, 
         question: str,
         subject_override: Optional[str] = None,
-        top_k: int = TOP_K_RESULTS
+        top_k: int = TOP_K_RESULTS,
+        precomputed_embedding: Optional[np.ndarray] = None
     ) -> Dict[str, Any]:
         """
         Process a query and return structured response.
@@ -53,10 +88,87 @@ class RAGChain:
             question: User's question
             subject_override: Optional subject to force
             top_k: Number of documents to retrieve
+            precomputed_embedding: Optional query embedding from embed(), reused
+                for both the cache lookup and retrieval
             
         Returns:
             Structured JSON response
         """
+        plan = self._prepare_query(question, subject_override, top_k, precomputed_embedding)
+        if "response" in plan:
+            return plan["response"]
+        
+        # Step 7: Generate response using LLM
+        print(f"🤖 Generating response with {self.llm_model}...")
+        response_text = self._generate_response(
+            question=question,
+            context=plan["context"],
+            is_math=plan["is_math"],
+            language=plan["language"]
+        )
+        
+        return self._finalize_response(plan, response_text)
+    
+    def query_stream(
+        self,
+        question: str,
+        subject_override: Optional[str] = None,
+        top_k: int = TOP_K_RESULTS,
+        precomputed_embedding: Optional[np.ndarray] = None
+    ) -> Generator[str, None, Dict[str, Any]]:
+        """
+        Process a query, yielding LLM tokens as they are generated.
+        
+        Takes the same arguments as query(). Cache hits and no-result answers
+        yield no tokens. The structured response is the generator's return
+        value, e.g. ``response = yield from rag.query_stream(question)``.
+        
+        Yields:
+            Raw response text chunks from the LLM
+        """
+        plan = self._prepare_query(question, subject_override, top_k, precomputed_embedding)
+        if "response" in plan:
+            return plan["response"]
+        
+        # Step 7: Stream response from LLM, keeping the full text for parsing
+        print(f"🤖 Streaming response from {self.llm_model}...")
+        system, prompt = self._build_prompt(
+            question, plan["context"], plan["is_math"], plan["language"]
+        )
+        chunks = []
+        try:
+            for chunk in self.ollama_client.generate(
+                model=self.llm_model,
+                system=system,
+                prompt=prompt,
+                options=self._llm_options(plan["is_math"], system, prompt),
+                keep_alive=OLLAMA_KEEP_ALIVE,
+                stream=True
+            ):
+                token = chunk["response"]
+                chunks.append(token)
+                yield token
+        except Exception as e:
+            print(f"Error generating response: {e}")
+            # Discard any partial output so the formatter sees only the error payload
+            chunks = [self._error_response_text(e)]
+        
+        return self._finalize_response(plan, "".join(chunks))
+    
+    def _prepare_query(
+        self,
+        question: str,
+        subject_override: Optional[str],
+        top_k: int,
+        precomputed_embedding: Optional[np.ndarray]
+    ) -> Dict[str, Any]:
+        """
+        Run every step before generation: detection, cache lookup and retrieval.
+        
+        Returns:
+            Query state for generation, or {"response": ...} when the answer
+            is already known (cache hit or no documents found)
+        """
         # Step 1: Detect language
         language = self.language_detector.detect(question)
         print(f"📝 Detected language: {language}")
@@ -76,13 +188,35 @@ class RAGChain:
         print(f"📚 Classified subject: {subject} (confidence: {confidence:.2f})")
         print(f"🔢 Is math problem: {is_math}")
         
-        # Step 4: Retrieve relevant documents
+        # Step 4: Check semantic cache for a near-duplicate question
+        # The query is embedded once here and reused for retrieval below
+        query_embedding = precomputed_embedding
+        if query_embedding is None:
+            query_embedding = self.embed(question)
+        
+        # Namespaced by subject and language so cached answers never cross over.
+        # Math problems that differ only in their numbers embed almost identically,
+        # so their worked solutions are never served from the semantic cache.
+        cache_namespace = f"{subject or 'All'}:{language}"
+        if self.semantic_cache is not None and not is_math:
+            cached = self.semantic_cache.lookup(query_embedding, cache_namespace)
+            if cached is not None:
+                print("⚡ Semantic cache hit")
+                return {"response": cached}
+        
+        # A cache miss almost always ends in generation, so overlap a possible
+        # cold model load with retrieval
+        self._preload_llm()
+        
+        # Step 5: Retrieve relevant documents
         results = []
         
         # If no confident subject classification, search ALL subjects and pick best results
         if subject is None or confidence < 0.3:
             print(f"🔍 Low confidence classification, searching ALL indices...")
-            all_results = self.vector_store.search_all_subjects(question, top_k)
+            all_results = self.vector_store.search_all_subjects(
+                question, top_k, query_embedding=query_embedding
+            )
             
             # Find results with best scores across all subjects
             best_results = []
@@ -104,13 +238,16 @@ class RAGChain:
                 query=question,
                 subject=subject,
                 top_k=top_k,
-                metadata_filter=None
+                metadata_filter=None,
+                query_embedding=query_embedding
             )
             
             # If no results in primary subject, try other subjects
             if not results:
                 print(f"⚠️ No results in {subject}, searching other indices...")
-                all_results = self.vector_store.search_all_subjects(question, top_k)
+                all_results = self.vector_store.search_all_subjects(
+                    question, top_k, query_embedding=query_embedding
+                )
                 for subj, res in all_results.items():
                     if res:
                         results = res[:top_k]
@@ -118,78 +255,208 @@ class RAGChain:
                         break
         
         if not results:
-            return self._create_no_results_response(question, language)
+            return {"response": self._create_no_results_response(question, language)}
         
         print(f"📄 Retrieved {len(results)} documents")
         
-        # Step 6: Build context from retrieved documents
-        context = self._build_context(results)
+        # Step 6: Build context from retrieved documents, leaving room in the
+        # context window for the rest of the prompt and at least MIN_NUM_PREDICT answer tokens
+        system, prompt = self._build_prompt(question, "", is_math, language)
+        context_tokens = (LLM_NUM_CTX - MIN_NUM_PREDICT
+                          - self._estimate_tokens(system) - self._estimate_tokens(prompt))
+        context = self._build_context(results, max_tokens=context_tokens)
         
-        # Step 7: Generate response using LLM
-        print(f"🤖 Generating response with {self.llm_model}...")
-        response_text = self._generate_response(
-            question=question,
-            context=context,
-            is_math=is_math,
-            language=language
-        )
+        return {
+            "question": question,
+            "language": language,
+            "subject": subject,
+            "confidence": confidence,
+            "is_math": is_math,
+            "query_embedding": query_embedding,
+            "cache_namespace": cache_namespace,
+            "documents_retrieved": len(results),
+            "context": context
+        }
+    
+    def _finalize_response(self, plan: Dict[str, Any], response_text: str) -> Dict[str, Any]:
+        """
+        Format generated text, attach metadata and store it in the semantic cache.
+        
+        Args:
+            plan: Query state from _prepare_query
+            response_text: Raw LLM output
+            
+        Returns:
+            Structured JSON response
+        """
+        question = plan["question"]
         
         # Step 8: Format response
-        if is_math:
-            formatted = self.output_formatter.format_math_response(response_text, question)
+        if plan["is_math"]:
+            formatted = OutputFormatter.format_math_response(response_text, question)
         else:
-            formatted = self.output_formatter.format_general_response(response_text, question, subject)
+            formatted = OutputFormatter.format_general_response(response_text, question, plan["subject"])
         
         # Add metadata to response
         formatted["_metadata"] = {
-            "subject": subject,
-            "language": language,
-            "is_math_problem": is_math,
-            "documents_retrieved": len(results),
-            "confidence": confidence
+            "subject": plan["subject"],
+            "language": plan["language"],
+            "is_math_problem": plan["is_math"],
+            "documents_retrieved": plan["documents_retrieved"],
+            "confidence": plan["confidence"],
+            "cache_hit": False
         }
         
+        # Cache successful answers only; generation errors should be retried
+        if (self.semantic_cache is not None and not plan["is_math"]
+                and formatted.get("caption") != "Error"):
+            self.semantic_cache.add(
+                plan["query_embedding"], formatted, plan["cache_namespace"], question=question
+            )
+        
         return formatted
     
-    def _build_context(self, documents: List[Dict[str, Any]], max_length: int = 4000) -> str:
+    def embed(self, text: str) -> np.ndarray:
+        """
+        Embed a query once for reuse across cache lookup and retrieval.
+        
+        Args:
+            text: Text to embed
+            
+        Returns:
+            L2-normalized embedding, so cosine similarity is a plain dot product
+        """
+        # Keyed by model too, so switching embedding models never reuses stale vectors
+        key = (self.vector_store.embedding_model, text)
+        with self._embedding_cache_lock:
+            cached = self._embedding_cache.get(key)
+            if cached is not None:
+                self._embedding_cache.move_to_end(key)
+                return cached
+        
+        # Embedded outside the lock, so a slow Ollama call never blocks other sessions
+        embedding = self.embed_batch([text])[0]
+        if embedding.any():  # Zero vectors mean the request failed; don't keep them
+            embedding.setflags(write=False)  # Shared by every hit, so callers can't modify it
+            with self._embedding_cache_lock:
+                self._embedding_cache[key] = embedding
+                if len(self._embedding_cache) > EMBEDDING_CACHE_SIZE:
+                    self._embedding_cache.popitem(last=False)
+        return embedding
+    
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed several queries with one Ollama round-trip.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            L2-normalized embeddings (len(texts) x dim), as the vector store returns them
+        """
+        return self.vector_store.embed_texts(texts)
+    
+    def _build_context(
+        self,
+        documents: List[Dict[str, Any]],
+        max_length: int = 4000,
+        max_tokens: Optional[int] = None
+    ) -> str:
         """
         Build context string from retrieved documents.
         
         Args:
             documents: List of retrieved documents
             max_length: Maximum context length
+            max_tokens: Optional token budget, as estimated by _estimate_tokens
             
         Returns:
             Concatenated context string
         """
+        documents = self._select_diverse(documents)
         context_parts = []
-        current_length = 0
+        remaining = max_length
+        # The token budget is tracked in UTF-8 bytes, the unit _estimate_tokens counts
+        remaining_bytes = max(max_tokens, 0) * 3 if max_tokens is not None else None
         
         for doc in documents:
             text = doc.get("text", "")
-            metadata = doc.get("metadata", {})
             
-            # Add source info
-            source_info = f"[Source: {metadata.get('source_file', 'Unknown')} - {metadata.get('topic', 'General')}]\n"
-            doc_text = source_info + text + "\n\n"
+            # Source header, preformatted by the vector store
+            source_info = doc.get("source") or VectorStore.source_label(doc.get("metadata", {}))
+            doc_length = len(source_info) + len(text) + 2
+            over_budget = doc_length > remaining
+            if remaining_bytes is not None:
+                doc_bytes = len(source_info.encode("utf-8")) + len(text.encode("utf-8")) + 2
+                over_budget = over_budget or doc_bytes > remaining_bytes
             
-            if current_length + len(doc_text) > max_length:
+            if over_budget:
+                # Fill the rest of the budget with the start of this document,
+                # cut at a word boundary, instead of dropping it entirely
+                text = text[:max(remaining - len(source_info) - 2, 0)]
+                if remaining_bytes is not None:
+                    byte_room = max(remaining_bytes - len(source_info.encode("utf-8")) - 2, 0)
+                    text = text.encode("utf-8")[:byte_room].decode("utf-8", errors="ignore")
+                room = len(text)
+                if room >= MIN_PARTIAL_CONTEXT_CHARS:
+                    cut = text.rfind(" ")
+                    text = text[:cut if cut > room * 0.8 else room]
+                    context_parts.extend((source_info, text, "\n\n"))
                 break
             
-            context_parts.append(doc_text)
-            current_length += len(doc_text)
+            context_parts.extend((source_info, text, "\n\n"))
+            remaining -= doc_length
+            if remaining_bytes is not None:
+                remaining_bytes -= doc_bytes
         
         return "".join(context_parts)
     
-    def _generate_response(
+    def _select_diverse(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Order documents by maximal marginal relevance and drop near-duplicates.
+        
+        Textbook chunks often repeat each other; repeats would only fill the
+        context budget, so novel passages are placed first and repeats removed.
+        
+        Args:
+            documents: Retrieved documents, with "embedding" from the vector store
+            
+        Returns:
+            Documents in prompt order
+        """
+        if len(documents) < 2 or any("embedding" not in doc for doc in documents):
+            return documents
+        
+        # Quantized indices return approximate vectors, so renormalize before comparing
+        vectors = np.stack([doc["embedding"] for doc in documents])
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        similarity = vectors @ vectors.T
+        scores = np.array([doc.get("score", 0.0) for doc in documents], dtype=np.float32)
+        
+        first = int(scores.argmax())
+        selected = [first]
+        max_similarity = similarity[first].copy()  # To the closest selected document
+        candidates = max_similarity < CONTEXT_DEDUP_THRESHOLD
+        candidates[first] = False
+        while candidates.any():
+            mmr = np.where(candidates, scores - CONTEXT_MMR_LAMBDA * max_similarity, -np.inf)
+            best = int(mmr.argmax())
+            selected.append(best)
+            np.maximum(max_similarity, similarity[best], out=max_similarity)
+            candidates &= max_similarity < CONTEXT_DEDUP_THRESHOLD
+            candidates[best] = False
+        
+        return [documents[i] for i in selected]
+    
+    def _build_prompt(
         self,
         question: str,
         context: str,
         is_math: bool,
         language: str
-    ) -> str:
+    ) -> Tuple[str, str]:
         """
-        Generate response using Ollama LLM.
+        Build the LLM system message (language requirement) and prompt.
         
         Args:
             question: User question
@@ -198,7 +465,7 @@ class RAGChain:
             language: Query language
             
         Returns:
-            Generated response text
+            Tuple of (system message, prompt text)
         """
         # Build language instruction as a system-level requirement
         if language == "Tamil":
@@ -208,33 +475,114 @@ class RAGChain:
         
         # Select appropriate prompt template
         if is_math:
-            base_prompt = MATH_SYSTEM_PROMPT.format(context=context, question=question)
+            base_prompt = MATH_PROMPT_TEMPLATE.substitute(context=context, question=question)
         else:
-            base_prompt = GENERAL_SYSTEM_PROMPT.format(context=context, question=question)
+            base_prompt = GENERAL_PROMPT_TEMPLATE.substitute(context=context, question=question)
+        
+        # The language instruction goes in the system message: it leads every
+        # prompt once (no trailing repeat), and the prefix is identical for all
+        # queries in a language, so Ollama can reuse its cached prefill
+        return lang_instruction, base_prompt
+    
+    def _llm_options(self, is_math: bool, system: str, prompt: str) -> Dict[str, Any]:
+        """
+        Sampling options for the Ollama LLM.
+        
+        The answer length is capped per answer type and by the room the
+        prompt leaves in the context window.
+        
+        Args:
+            is_math: Whether this is a math problem
+            system: System message
+            prompt: Prompt text
+            
+        Returns:
+            Options for ollama generate
+        """
+        num_predict = MATH_NUM_PREDICT if is_math else GENERAL_NUM_PREDICT
+        room = LLM_NUM_CTX - self._estimate_tokens(system) - self._estimate_tokens(prompt)
+        # The context was trimmed to leave MIN_NUM_PREDICT free, so the floor only
+        # takes effect for a question that alone nearly fills the window
+        return {
+            **MODEL_LOAD_OPTIONS,
+            "temperature": 0.3,
+            "top_p": 0.9,
+            "num_predict": max(min(num_predict, room), MIN_NUM_PREDICT)
+        }
+    
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """
+        Upper estimate of the token count of a text.
         
-        # Combine with language instruction at the START (more prominent)
-        prompt = f"{lang_instruction}\n\n{base_prompt}\n\nREMINDER: {lang_instruction}"
+        Counts UTF-8 bytes rather than characters: a Tamil letter takes 3 bytes
+        and about a token, while English averages about 4 bytes per token.
+        """
+        return len(text.encode("utf-8")) // 3 + 1
+    
+    def _error_response_text(self, error: Exception) -> str:
+        """Fallback JSON returned when generation fails."""
+        return json.dumps({
+            "summary": f"Error generating response: {str(error)}",
+            "caption": "Error",
+            "bullet_points": [],
+            "table": []
+        })
+    
+    def _generate_response(
+        self,
+        question: str,
+        context: str,
+        is_math: bool,
+        language: str
+    ) -> str:
+        """
+        Generate response using Ollama LLM.
+        
+        Args:
+            question: User question
+            context: Retrieved context
+            is_math: Whether this is a math problem
+            language: Query language
+            
+        Returns:
+            Generated response text
+        """
+        system, prompt = self._build_prompt(question, context, is_math, language)
         
         try:
             response = self.ollama_client.generate(
                 model=self.llm_model,
+                system=system,
                 prompt=prompt,
-                options={
-                    "temperature": 0.3,
-                    "top_p": 0.9,
-                    "num_predict": 1000  # Reduced for faster responses
-                }
+                options=self._llm_options(is_math, system, prompt),
+                keep_alive=OLLAMA_KEEP_ALIVE
             )
             return response["response"]
             
         except Exception as e:
             print(f"Error generating response: {e}")
-            return json.dumps({
-                "summary": f"Error generating response: {str(e)}",
-                "caption": "Error",
-                "bullet_points": [],
-                "table": []
-            })
+            return self._error_response_text(e)
+    
+    def _preload_llm(self) -> None:
+        """Start loading the LLM into memory without waiting for it."""
+        if self._preload_executor is None:
+            return
+        if self._preload is not None and not self._preload.done():
+            return  # A load is already in flight
+        self._preload = self._preload_executor.submit(self._load_llm)
+    
+    def _load_llm(self) -> None:
+        """Ask Ollama to load the LLM (an empty prompt loads it without generating)."""
+        try:
+            self.ollama_client.generate(
+                model=self.llm_model,
+                prompt="",
+                options=MODEL_LOAD_OPTIONS,
+                keep_alive=OLLAMA_KEEP_ALIVE
+            )
+        except Exception as e:
+            print(f"Error preloading {self.llm_model}: {e}")
     
     def _create_no_results_response(self, question: str, language: str) -> Dict[str, Any]:
         """Create response when no documents are found."""
@@ -258,18 +606,22 @@ class RAGChain:
         }
     
     def load_vector_store(self, directory: Optional[Path] = None) -> None:
-        """Load vector store from disk."""
+        """Load vector store from disk and warm the semantic cache from the query log."""
         if directory is not None:
             self.vector_store.load(directory)
         else:
             self.vector_store.load()
+        
+        if self.semantic_cache is not None:
+            self.semantic_cache.warm()
     
     def get_stats(self) -> Dict[str, Any]:
         """Get statistics about the RAG system."""
         return {
             "vector_store_stats": self.vector_store.get_stats(),
             "llm_model": self.llm_model,
-            "embedding_model": self.vector_store.embedding_model
+            "embedding_model": self.vector_store.embedding_model,
+            "cached_responses": len(self.semantic_cache) if self.semantic_cache is not None else 0
         }
 
 
@@ -0,0 +1,369 @@
+"""
+Semantic Cache Module
+Caches structured responses keyed by query embedding so near-duplicate
+questions can be answered without retrieval or LLM generation.
+"""
+import json
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+# Optional: orjson writes and reads the query log several times faster
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config import (
+    LOGS_DIR, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_ENTRIES, CACHE_WARM_ENTRIES
+)
+
+# Rows preallocated for a new namespace; capacity doubles as it fills
+INITIAL_CAPACITY = 16
+
+# Append-only query log: one JSON line per answer, embeddings as raw float32
+QUERY_LOG_FILE = "queries.jsonl"
+QUERY_EMBEDDINGS_FILE = "query_embeddings.f32"
+COMPACTING_MARKER_FILE = "queries.compacting"
+
+
+def _dumps(entry: Dict[str, Any]) -> str:
+    """Serialize a log entry to one line of JSON, using orjson when available."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(entry, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            pass  # Unsupported value type; the stdlib encoder handles the rest
+    return json.dumps(entry, ensure_ascii=False)
+
+
+def _loads(line: str) -> Any:
+    """Parse one log line, using orjson when available."""
+    if orjson is not None:
+        try:
+            return orjson.loads(line)
+        except orjson.JSONDecodeError:
+            pass  # Let the stdlib parser decide (it also accepts NaN/Infinity)
+    return json.loads(line)
+
+
+class SemanticCache:
+    """Embedding-keyed response cache with per-namespace cosine lookup."""
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        log_dir: Optional[Path] = LOGS_DIR,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES
+    ):
+        """
+        Initialize the semantic cache.
+
+        Args:
+            threshold: Minimum cosine similarity for a cache hit
+            log_dir: Directory for the persistent query log (None keeps it in memory)
+            max_entries: Responses kept per namespace before the oldest is replaced
+        """
+        self.threshold = threshold
+        self.log_dir = log_dir
+        self.max_entries = max_entries
+        # One embedding matrix and parallel response list per namespace. Matrices are
+        # preallocated, so only the first len(responses) rows hold entries.
+        self.emb_matrices: Dict[str, np.ndarray] = {}
+        self.responses: Dict[str, List[Dict[str, Any]]] = {}
+        # Slot overwritten next once a namespace is full (its oldest entry)
+        self._oldest: Dict[str, int] = {}
+        # The chain (and this cache) is shared across app sessions; the lock keeps
+        # each matrix row-aligned with its response list
+        self._lock = threading.Lock()
+        # Separate lock for the query log, so disk writes never hold up lookups
+        self._log_lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> Optional[np.ndarray]:
+        """L2-normalize an embedding, returning None for zero vectors."""
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(embedding)
+        if norm == 0:
+            return None
+        return embedding / norm
+
+    def lookup(self, embedding: np.ndarray, namespace: str) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached response for a near-duplicate query.
+
+        Args:
+            embedding: Query embedding
+            namespace: Cache namespace (e.g. subject and language)
+
+        Returns:
+            Cached response flagged with cache_hit, or None on a miss
+        """
+        query = self._normalize(embedding)
+        if query is None:
+            return None
+
+        with self._lock:
+            matrix = self.emb_matrices.get(namespace)
+            if matrix is None or query.shape[0] != matrix.shape[1]:
+                return None
+            responses = self.responses[namespace]
+
+            # Rows are unit-norm, so a single matrix-vector product gives cosine scores
+            scores = matrix[:len(responses)] @ query
+            idx = int(scores.argmax())
+            if scores[idx] < self.threshold:
+                return None
+            response = responses[idx]
+
+        cached = dict(response)
+        cached["_metadata"] = {**cached.get("_metadata", {}), "cache_hit": True}
+        return cached
+
+    def add(
+        self,
+        embedding: np.ndarray,
+        response: Dict[str, Any],
+        namespace: str,
+        question: str = ""
+    ) -> None:
+        """
+        Store a response for future lookups and append it to the query log.
+
+        Args:
+            embedding: Query embedding
+            response: Structured response to cache
+            namespace: Cache namespace (e.g. subject and language)
+            question: Original question, recorded in the query log
+        """
+        row = self._normalize(embedding)
+        if row is None:
+            return
+
+        self._insert(row, response, namespace)
+        if self.log_dir is not None:
+            self._append_log(row, response, namespace, question)
+
+    def _insert(self, row: np.ndarray, response: Dict[str, Any], namespace: str) -> None:
+        """Add a unit-norm row and its response to the in-memory cache."""
+        with self._lock:
+            matrix = self.emb_matrices.get(namespace)
+            if matrix is None:
+                capacity = min(INITIAL_CAPACITY, self.max_entries)
+                matrix = np.empty((capacity, row.shape[0]), dtype=np.float32)
+                self.emb_matrices[namespace] = matrix
+                self.responses[namespace] = []
+                self._oldest[namespace] = 0
+            elif matrix.shape[1] != row.shape[0]:
+                return
+
+            responses = self.responses[namespace]
+            count = len(responses)
+            if count < self.max_entries:
+                if count == matrix.shape[0]:
+                    # Double the capacity: amortized O(1) copying per insert
+                    grown = np.empty((min(2 * count, self.max_entries), matrix.shape[1]), dtype=np.float32)
+                    grown[:count] = matrix
+                    matrix = self.emb_matrices[namespace] = grown
+                matrix[count] = row
+                responses.append(response)
+            else:
+                # Full: replace the oldest entry in place (FIFO)
+                slot = self._oldest[namespace]
+                matrix[slot] = row
+                responses[slot] = response
+                self._oldest[namespace] = (slot + 1) % self.max_entries
+
+    def _append_log(
+        self,
+        row: np.ndarray,
+        response: Dict[str, Any],
+        namespace: str,
+        question: str
+    ) -> None:
+        """Append one answered query to the on-disk log."""
+        self.log_dir.mkdir(exist_ok=True)
+
+        with self._log_lock:
+            # Embedding first, so a log line never points past the end of the file.
+            # Both appends happen under the lock, so the offset is this row's own.
+            with open(self.log_dir / QUERY_EMBEDDINGS_FILE, "ab") as f:
+                offset = f.tell()
+                f.write(row.astype("<f4").tobytes())
+
+            entry = {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "question": question,
+                "namespace": namespace,
+                "offset": offset,
+                "dim": int(row.shape[0]),
+                "response": response
+            }
+            with open(self.log_dir / QUERY_LOG_FILE, "a", encoding="utf-8") as f:
+                f.write(_dumps(entry) + "\n")
+
+    def warm(self, max_entries: int = CACHE_WARM_ENTRIES) -> None:
+        """
+        Prime the cache with the most recent answers from the query log.
+
+        The log is then compacted to the entries loaded, so it stays bounded
+        and the next start reads no more than max_entries lines.
+
+        Args:
+            max_entries: Number of most recent log entries to load
+        """
+        if self.log_dir is None:
+            return
+
+        log_path = self.log_dir / QUERY_LOG_FILE
+        embeddings_path = self.log_dir / QUERY_EMBEDDINGS_FILE
+        marker_path = self.log_dir / COMPACTING_MARKER_FILE
+
+        # Held throughout, so no answer is appended between reading and compacting
+        with self._log_lock:
+            if marker_path.exists():
+                # A compaction stopped between its two file swaps, so the log may
+                # point into the wrong embeddings file: start cold instead
+                print("⚠️ Query log compaction was interrupted; discarding the log")
+                for path in (log_path, embeddings_path, marker_path):
+                    path.unlink(missing_ok=True)
+                return
+            if not log_path.exists() or not embeddings_path.exists():
+                return
+            if embeddings_path.stat().st_size == 0:
+                return
+
+            entries, rows, total = self._read_log(log_path, embeddings_path, max_entries)
+            if total > len(entries):
+                self._compact_log(entries, rows, log_path, embeddings_path, marker_path)
+
+        # Stack each namespace once instead of inserting row by row
+        grouped: Dict[str, Tuple[List[np.ndarray], List[Dict[str, Any]]]] = {}
+        for entry, row in zip(entries, rows):
+            ns_rows, ns_responses = grouped.setdefault(entry["namespace"], ([], []))
+            if ns_rows and ns_rows[0].shape[0] != row.shape[0]:
+                continue  # Embedded by a different model
+            ns_rows.append(row)
+            ns_responses.append(entry["response"])
+
+        with self._lock:
+            self.emb_matrices.clear()
+            self.responses.clear()
+            self._oldest.clear()
+            for namespace, (ns_rows, ns_responses) in grouped.items():
+                self.emb_matrices[namespace] = np.vstack(ns_rows[-self.max_entries:])
+                self.responses[namespace] = ns_responses[-self.max_entries:]
+                self._oldest[namespace] = 0
+
+        print(f"Warmed semantic cache: {len(self)} entries")
+
+    @staticmethod
+    def _read_log(
+        log_path: Path,
+        embeddings_path: Path,
+        max_entries: int
+    ) -> Tuple[List[Dict[str, Any]], List[np.ndarray], int]:
+        """
+        Read the most recent valid entries of the query log.
+
+        Args:
+            log_path: Query log (JSON lines)
+            embeddings_path: Raw float32 embeddings the log points into
+            max_entries: Number of most recent log lines to consider
+
+        Returns:
+            Tuple of (entries, their embedding rows, total lines in the log)
+        """
+        # A crash mid-append can leave a torn line; it is skipped below, not fatal
+        total = 0
+        recent: deque = deque(maxlen=max_entries)
+        with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if line.strip():
+                    total += 1
+                    recent.append(line)
+
+        # Memory-mapped, so only the rows for recent entries are read from disk
+        embeddings = np.memmap(embeddings_path, dtype="<f4", mode="r")
+
+        entries = []
+        rows = []
+        skipped = 0
+        for line in recent:
+            try:
+                entry = _loads(line)
+                offset, dim, namespace = entry["offset"], entry["dim"], entry["namespace"]
+                is_math = entry["response"].get("_metadata", {}).get("is_math_problem")
+            except (ValueError, KeyError, TypeError, AttributeError):
+                skipped += 1  # Torn or corrupt line
+                continue
+            if is_math:
+                continue  # Logged before math answers stopped being cached
+
+            # The row must lie entirely inside the embeddings file
+            if (not isinstance(namespace, str)
+                    or not isinstance(offset, int) or not isinstance(dim, int)
+                    or offset < 0 or offset % 4 or dim <= 0
+                    or offset // 4 + dim > embeddings.shape[0]):
+                skipped += 1
+                continue
+            start = offset // 4
+            entries.append(entry)
+            rows.append(np.array(embeddings[start:start + dim], dtype=np.float32))
+
+        if skipped:
+            print(f"Skipped {skipped} unreadable query log entries")
+        return entries, rows, total
+
+    @staticmethod
+    def _compact_log(
+        entries: List[Dict[str, Any]],
+        rows: List[np.ndarray],
+        log_path: Path,
+        embeddings_path: Path,
+        marker_path: Path
+    ) -> None:
+        """
+        Rewrite the query log and embeddings file down to the given entries.
+
+        Args:
+            entries: Log entries to keep, oldest first
+            rows: Embedding row of each entry
+            log_path: Query log (JSON lines)
+            embeddings_path: Raw float32 embeddings the log points into
+            marker_path: File present while the two files are being swapped
+        """
+        log_tmp = log_path.with_name(log_path.name + ".tmp")
+        embeddings_tmp = embeddings_path.with_name(embeddings_path.name + ".tmp")
+
+        offset = 0
+        with open(embeddings_tmp, "wb") as ef, open(log_tmp, "w", encoding="utf-8") as lf:
+            for entry, row in zip(entries, rows):
+                ef.write(row.astype("<f4").tobytes())
+                lf.write(_dumps({**entry, "offset": offset}) + "\n")
+                offset += row.shape[0] * 4
+
+        # The two swaps are not atomic together; the marker tells warm() if one was missed
+        marker_path.touch()
+        os.replace(embeddings_tmp, embeddings_path)
+        os.replace(log_tmp, log_path)
+        marker_path.unlink()
+
+    def clear(self) -> None:
+        """Remove all cached entries from memory (the query log is kept)."""
+        with self._lock:
+            self.emb_matrices.clear()
+            self.responses.clear()
+            self._oldest.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(responses) for responses in self.responses.values())
@@ -4,6 +4,7 @@ Manages FAISS indices for subject-specific document storage and retrieval.
 """
 import os
 import pickle
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
@@ -15,6 +16,7 @@ except ImportError:
     print("FAISS not installed. Please run: pip install faiss-cpu")
     raise
 
+import httpx
 import ollama
 
 import sys
@@ -22,7 +24,12 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from config import (
     EMBEDDING_MODEL, VECTOR_STORE_DIR, SUBJECTS, 
-    TOP_K_RESULTS, OLLAMA_BASE_URL
+    TOP_K_RESULTS, OLLAMA_BASE_URL, OLLAMA_KEEP_ALIVE, OLLAMA_MAX_CONNECTIONS,
+    VECTOR_QUANTIZATION,
+    VECTOR_INDEX_TYPE, HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH,
+    IVFPQ_MIN_VECTORS, IVFPQ_M, IVFPQ_NPROBE, IVFPQ_REFINE_K_FACTOR,
+    VECTOR_MMAP, FAISS_THREADS,
+    EMBED_CONCURRENCY
 )
 
 # Maximum characters for embedding (mxbai-embed-large has ~512 token limit, ~1.5 chars/token for mixed content)
@@ -35,11 +42,33 @@ class VectorStore:
     def __init__(self, embedding_model: str = EMBEDDING_MODEL):
         self.embedding_model = embedding_model
         self.indices: Dict[str, faiss.Index] = {}
-        self.documents: Dict[str, List[Dict[str, Any]]] = {subject: [] for subject in SUBJECTS}
+        # Chunk texts and metadata are kept as parallel lists, row-aligned with the index
+        self.texts: Dict[str, List[str]] = {subject: [] for subject in SUBJECTS}
+        self.metadatas: Dict[str, List[Dict[str, Any]]] = {subject: [] for subject in SUBJECTS}
+        # Context headers ("[Source: file - topic]"), formatted once per chunk, not per query
+        self.sources: Dict[str, List[str]] = {subject: [] for subject in SUBJECTS}
         self.embedding_dim: Optional[int] = None
+        # Subjects whose index is memory-mapped from disk, with the mapped file
+        self._mapped_indices: Dict[str, Path] = {}
         
-        # Initialize Ollama client
-        self.ollama_client = ollama.Client(host=OLLAMA_BASE_URL)
+        # Initialize Ollama client. Its httpx pool keeps connections alive; size it for
+        # concurrent ingest embeddings and keep idle connections open between queries
+        self.ollama_client = ollama.Client(
+            host=OLLAMA_BASE_URL,
+            limits=httpx.Limits(
+                max_keepalive_connections=OLLAMA_MAX_CONNECTIONS,
+                max_connections=2 * OLLAMA_MAX_CONNECTIONS,
+                keepalive_expiry=300
+            )
+        )
+        
+        # FAISS parallelizes index building and multi-query searches with OpenMP;
+        # cap it when the tutor shares the machine with Ollama
+        if FAISS_THREADS:
+            faiss.omp_set_num_threads(FAISS_THREADS)
+        
+        # Threads for cross-subject searches (FAISS releases the GIL), started on first use
+        self._search_executor: Optional[ThreadPoolExecutor] = None
         
         # Ensure vector store directory exists
         VECTOR_STORE_DIR.mkdir(exist_ok=True)
@@ -59,11 +88,15 @@ class VectorStore:
         """
         Get embedding for a single text using Ollama.
         
+        All embeddings returned or stored by the vector store are unit-norm
+        (zero vectors from failed requests excepted), so inner product is
+        cosine similarity without renormalizing anywhere else.
+        
         Args:
             text: Text to embed
             
         Returns:
-            Embedding as numpy array
+            L2-normalized embedding as numpy array
         """
         # Truncate text to fit within model limits
         text = self._truncate_text(text)
@@ -71,9 +104,11 @@ class VectorStore:
         try:
             response = self.ollama_client.embeddings(
                 model=self.embedding_model,
-                prompt=text
+                prompt=text,
+                keep_alive=OLLAMA_KEEP_ALIVE
             )
             embedding = np.array(response['embedding'], dtype=np.float32)
+            faiss.normalize_L2(embedding.reshape(1, -1))  # In place, through the view
             
             # Set embedding dimension on first call
             if self.embedding_dim is None:
@@ -88,95 +123,219 @@ class VectorStore:
                 return np.zeros(self.embedding_dim, dtype=np.float32)
             raise
     
-    def get_embeddings_batch(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Get embeddings for several texts in a single Ollama request.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            L2-normalized embeddings (len(texts) x dim)
+        """
+        texts = [self._truncate_text(text) for text in texts]
+        
+        try:
+            response = self.ollama_client.embed(
+                model=self.embedding_model,
+                input=texts,
+                keep_alive=OLLAMA_KEEP_ALIVE
+            )
+            embeddings = np.asarray(response['embeddings'], dtype=np.float32)
+            faiss.normalize_L2(embeddings)
+            
+            # Set embedding dimension on first call
+            if self.embedding_dim is None:
+                self.embedding_dim = embeddings.shape[1]
+            
+            return embeddings
+            
+        except Exception as e:
+            print(f"Error getting embeddings for {len(texts)} texts: {e}")
+            if len(texts) > 1:
+                # Retry one by one so a single bad text doesn't zero the whole batch
+                return np.array([self.get_embedding(text) for text in texts], dtype=np.float32)
+            # Return zero vectors on error to continue processing
+            if self.embedding_dim:
+                return np.zeros((len(texts), self.embedding_dim), dtype=np.float32)
+            raise
+    
+    def get_embeddings_batch(
+        self,
+        texts: List[str],
+        batch_size: int = 128,
+        concurrency: int = EMBED_CONCURRENCY
+    ) -> np.ndarray:
         """
-        Get embeddings for multiple texts.
+        Get embeddings for multiple texts, one Ollama request per batch.
         
         Args:
             texts: List of texts to embed
-            batch_size: Batch size for processing
+            batch_size: Texts sent per /api/embed request
+            concurrency: Batch requests kept in flight at once
             
         Returns:
-            Array of embeddings
+            L2-normalized embeddings (len(texts) x dim)
         """
-        embeddings = []
+        if not texts:
+            return np.array([], dtype=np.float32)
         
-        for i in tqdm(range(0, len(texts), batch_size), desc="Generating embeddings"):
-            batch = texts[i:i + batch_size]
-            batch_embeddings = [self.get_embedding(text) for text in batch]
-            embeddings.extend(batch_embeddings)
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
         
-        return np.array(embeddings, dtype=np.float32)
+        # Requests are network-bound, so threads overlap them; with
+        # OLLAMA_NUM_PARALLEL > 1 the server also computes them in parallel.
+        # map() keeps the results in batch order.
+        # Each batch is copied into one preallocated array as it arrives, so the
+        # full N x dim result is never held twice
+        embeddings = None
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(batches)))) as executor:
+            results = tqdm(
+                executor.map(self.embed_texts, batches),
+                total=len(batches),
+                desc="Generating embeddings"
+            )
+            for start, batch_embeddings in zip(range(0, len(texts), batch_size), results):
+                if embeddings is None:
+                    embeddings = np.empty((len(texts), batch_embeddings.shape[1]), dtype=np.float32)
+                embeddings[start:start + len(batch_embeddings)] = batch_embeddings
+        return embeddings
     
-    def create_index(self, subject: str, documents: List[Dict[str, Any]]) -> None:
+    def create_index(
+        self,
+        subject: str,
+        texts: List[str],
+        metadatas: List[Dict[str, Any]]
+    ) -> None:
         """
         Create a FAISS index for a specific subject.
         
         Args:
             subject: Subject name
-            documents: List of document chunks with text and metadata
+            texts: Chunk texts to embed
+            metadatas: Chunk metadata, aligned with texts
         """
-        if not documents:
+        if not texts:
             print(f"No documents to index for {subject}")
             return
         
-        print(f"\nCreating index for {subject} with {len(documents)} documents...")
-        
-        # Extract texts for embedding
-        texts = [doc["text"] for doc in documents]
+        print(f"\nCreating index for {subject} with {len(texts)} documents...")
         
-        # Generate embeddings
+        # Generate embeddings (already unit-norm, so inner product is cosine similarity)
         embeddings = self.get_embeddings_batch(texts)
         
-        # Normalize embeddings for cosine similarity
-        faiss.normalize_L2(embeddings)
-        
-        # Create FAISS index
-        dimension = embeddings.shape[1]
-        index = faiss.IndexFlatIP(dimension)  # Inner Product for cosine similarity
-        
-        # Add embeddings to index
-        index.add(embeddings)
+        # Create FAISS index and add embeddings
+        index = self._build_index(embeddings)
         
         # Store index and documents
+        self._mapped_indices.pop(subject, None)
         self.indices[subject] = index
-        self.documents[subject] = documents
+        self.texts[subject] = texts
+        self.metadatas[subject] = metadatas
+        self.sources[subject] = [self.source_label(metadata) for metadata in metadatas]
         
         print(f"  Created index with {index.ntotal} vectors")
     
-    def add_documents(self, subject: str, documents: List[Dict[str, Any]]) -> None:
+    def _build_index(self, embeddings: np.ndarray) -> faiss.Index:
+        """
+        Create a FAISS index holding the given normalized embeddings.
+        
+        Args:
+            embeddings: L2-normalized embeddings (N x dim)
+            
+        Returns:
+            Populated inner-product (cosine) index
+        """
+        num_vectors, dimension = embeddings.shape
+        quantize = VECTOR_QUANTIZATION == "int8"
+        # 8-bit scalar quantization: 4x less memory than float32 per vector.
+        # A single uniform range stays valid for tiny corpora and later appends.
+        qtype = faiss.ScalarQuantizer.QT_8bit_uniform
+        
+        if (quantize and VECTOR_INDEX_TYPE == "hnsw" and IVFPQ_MIN_VECTORS is not None
+                and num_vectors >= IVFPQ_MIN_VECTORS and dimension % IVFPQ_M == 0):
+            # Large subjects: IVF-PQ stores IVFPQ_M bytes per vector and scans
+            # only IVFPQ_NPROBE of ~4*sqrt(N) inverted lists per query
+            nlist = int(4 * np.sqrt(num_vectors))
+            quantizer = faiss.IndexFlatIP(dimension)
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, IVFPQ_M, 8, faiss.METRIC_INNER_PRODUCT)
+            index.nprobe = IVFPQ_NPROBE
+            # Row id -> list position, so search hits can be reconstructed
+            index.make_direct_map()
+            if IVFPQ_REFINE_K_FACTOR:
+                # Two-stage search: PQ picks k_factor * k candidates and an 8-bit copy
+                # of the vectors (1 byte per dimension, not float32's 4) reranks them
+                refine = faiss.IndexScalarQuantizer(dimension, qtype, faiss.METRIC_INNER_PRODUCT)
+                index = faiss.IndexRefine(index, refine)
+                index.k_factor = IVFPQ_REFINE_K_FACTOR
+        elif VECTOR_INDEX_TYPE == "hnsw":
+            # HNSW graph: roughly log(N) comparisons per query instead of a full scan
+            if quantize:
+                index = faiss.IndexHNSWSQ(dimension, qtype, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            else:
+                index = faiss.IndexHNSWFlat(dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            index.hnsw.efSearch = HNSW_EF_SEARCH
+        elif quantize:
+            index = faiss.IndexScalarQuantizer(dimension, qtype, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexFlatIP(dimension)  # Inner Product for cosine similarity
+        
+        index.train(embeddings)
+        index.add(embeddings)
+        return index
+    
+    def add_documents(
+        self,
+        subject: str,
+        texts: List[str],
+        metadatas: List[Dict[str, Any]]
+    ) -> None:
         """
         Add documents to an existing index.
         
         Args:
             subject: Subject name
-            documents: List of document chunks to add
+            texts: Chunk texts to add
+            metadatas: Chunk metadata, aligned with texts
         """
         if subject not in self.indices:
-            self.create_index(subject, documents)
+            self.create_index(subject, texts, metadatas)
             return
         
-        print(f"Adding {len(documents)} documents to {subject} index...")
+        print(f"Adding {len(texts)} documents to {subject} index...")
         
-        # Extract texts and generate embeddings
-        texts = [doc["text"] for doc in documents]
+        # Generate embeddings (already unit-norm)
         embeddings = self.get_embeddings_batch(texts)
         
-        # Normalize embeddings
-        faiss.normalize_L2(embeddings)
-        
-        # Add to index
+        # Add to index (a memory-mapped index is read-only, so load it into RAM first)
+        self._load_into_memory(subject)
         self.indices[subject].add(embeddings)
-        self.documents[subject].extend(documents)
+        self.texts[subject].extend(texts)
+        self.metadatas[subject].extend(metadatas)
+        self.sources[subject].extend(self.source_label(metadata) for metadata in metadatas)
         
         print(f"  Index now has {self.indices[subject].ntotal} vectors")
     
+    @staticmethod
+    def source_label(metadata: Dict[str, Any]) -> str:
+        """
+        Format the source header placed above a chunk in the LLM context.
+        
+        Args:
+            metadata: Chunk metadata
+            
+        Returns:
+            Header line, including its trailing newline
+        """
+        return f"[Source: {metadata.get('source_file', 'Unknown')} - {metadata.get('topic', 'General')}]\n"
+    
     def search(
         self, 
         query: str, 
         subject: str, 
         top_k: int = TOP_K_RESULTS,
-        metadata_filter: Optional[Dict[str, Any]] = None
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[np.ndarray] = None
     ) -> List[Dict[str, Any]]:
         """
         Search for relevant documents in a subject index.
@@ -186,6 +345,7 @@ class VectorStore:
             subject: Subject to search in
             top_k: Number of results to return
             metadata_filter: Optional metadata filters
+            query_embedding: Optional precomputed unit-norm embedding of the query
             
         Returns:
             List of relevant documents with scores
@@ -195,45 +355,110 @@ class VectorStore:
             return []
         
         # Get query embedding
-        query_embedding = self.get_embedding(query)
-        query_embedding = query_embedding.reshape(1, -1)
-        faiss.normalize_L2(query_embedding)
+        if query_embedding is None:
+            query_embedding = self.get_embedding(query)
+        return self._search_normalized(
+            self._query_row(query_embedding), subject, top_k, metadata_filter
+        )
+    
+    @staticmethod
+    def _query_row(query_embedding: np.ndarray) -> np.ndarray:
+        """View a unit-norm query embedding as the (1 x dim) float32 row FAISS expects."""
+        return np.asarray(query_embedding, dtype=np.float32).reshape(1, -1)
+    
+    def _search_normalized(
+        self,
+        query_embedding: np.ndarray,
+        subject: str,
+        top_k: int,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search a non-empty subject index with an already normalized query.
         
+        Args:
+            query_embedding: L2-normalized query embedding (1 x dim)
+            subject: Subject to search in
+            top_k: Number of results to return
+            metadata_filter: Optional metadata filters
+            
+        Returns:
+            List of relevant documents with scores
+        """
         # Search in FAISS index - get more results if filtering
-        search_k = top_k * 3 if metadata_filter else top_k
-        scores, indices = self.indices[subject].search(query_embedding, min(search_k, self.indices[subject].ntotal))
+        index = self.indices[subject]
+        search_k = min(top_k * 3 if metadata_filter else top_k, index.ntotal)
+        params = None
+        if hasattr(index, "hnsw"):
+            # Recall drops as k approaches or exceeds efSearch, so widen the
+            # candidate list for this query when many results are requested
+            params = faiss.SearchParametersHNSW(efSearch=max(HNSW_EF_SEARCH, search_k * 4))
+        scores, indices = index.search(query_embedding, search_k, params=params)
+        
+        # Filter pairs are read once; a document only restricts the keys it has
+        filter_items = tuple(metadata_filter.items()) if metadata_filter else ()
         
-        # Collect results
+        # Collect results, building a document dict only for hits that pass the filter
+        texts = self.texts[subject]
+        metadatas = self.metadatas[subject]
+        sources = self.sources[subject]
         results = []
-        for score, idx in zip(scores[0], indices[0]):
+        ids = []
+        # tolist() converts all hits to Python floats and ints in one call,
+        # instead of boxing a NumPy scalar per element inside the loop
+        for score, idx in zip(scores[0].tolist(), indices[0].tolist()):
             if idx < 0:  # FAISS returns -1 for invalid indices
                 continue
-                
-            doc = self.documents[subject][idx].copy()
-            doc["score"] = float(score)
             
-            # Apply metadata filter if provided
-            if metadata_filter:
-                match = True
-                for key, value in metadata_filter.items():
-                    if key in doc.get("metadata", {}):
-                        if doc["metadata"][key] != value:
-                            match = False
-                            break
-                if not match:
-                    continue
+            metadata = metadatas[idx]
+            if any(key in metadata and metadata[key] != value for key, value in filter_items):
+                continue
             
-            results.append(doc)
+            results.append({
+                "text": texts[idx],
+                "metadata": metadata,
+                "source": sources[idx],
+                "score": score
+            })
+            ids.append(idx)
             
             if len(results) >= top_k:
                 break
         
+        # Stored vectors let callers compare hits with each other (e.g. to drop
+        # near-duplicate passages) without embedding the texts again
+        embeddings = self._reconstruct(index, ids)
+        if embeddings is not None:
+            for result, embedding in zip(results, embeddings):
+                result["embedding"] = embedding
+        
         return results
     
+    @staticmethod
+    def _reconstruct(index: faiss.Index, ids: List[int]) -> Optional[np.ndarray]:
+        """
+        Decode stored vectors by row id.
+        
+        Args:
+            index: Index to read from
+            ids: Row ids
+            
+        Returns:
+            Vectors (len(ids) x dim), approximate for quantized indices, or None
+            if the index cannot reconstruct
+        """
+        if not ids:
+            return None
+        try:
+            return index.reconstruct_batch(np.asarray(ids, dtype=np.int64))
+        except RuntimeError:
+            return None  # e.g. an IVF index saved before it kept a direct map
+    
     def search_all_subjects(
         self, 
         query: str, 
-        top_k: int = TOP_K_RESULTS
+        top_k: int = TOP_K_RESULTS,
+        query_embedding: Optional[np.ndarray] = None
     ) -> Dict[str, List[Dict[str, Any]]]:
         """
         Search across all subject indices.
@@ -241,15 +466,34 @@ class VectorStore:
         Args:
             query: Search query
             top_k: Number of results per subject
+            query_embedding: Optional precomputed unit-norm embedding of the query
             
         Returns:
             Dictionary mapping subjects to results
         """
-        results = {}
-        for subject in SUBJECTS:
-            if subject in self.indices and self.indices[subject].ntotal > 0:
-                results[subject] = self.search(query, subject, top_k)
-        return results
+        # Embed once and share across every subject index
+        if query_embedding is None:
+            query_embedding = self.get_embedding(query)
+        query_embedding = self._query_row(query_embedding)
+        
+        subjects = [
+            subject for subject in SUBJECTS
+            if subject in self.indices and self.indices[subject].ntotal > 0
+        ]
+        if len(subjects) <= 1:
+            return {
+                subject: self._search_normalized(query_embedding, subject, top_k)
+                for subject in subjects
+            }
+        
+        # Search the subject indices concurrently
+        if self._search_executor is None:
+            self._search_executor = ThreadPoolExecutor(max_workers=len(SUBJECTS))
+        results = self._search_executor.map(
+            lambda subject: self._search_normalized(query_embedding, subject, top_k),
+            subjects
+        )
+        return dict(zip(subjects, results))
     
     def save(self, directory: Path = VECTOR_STORE_DIR) -> None:
         """
@@ -260,18 +504,40 @@ class VectorStore:
         """
         directory.mkdir(exist_ok=True)
         
-        for subject in SUBJECTS:
-            if subject in self.indices and self.indices[subject].ntotal > 0:
-                # Save FAISS index
-                index_path = directory / f"{subject.lower()}_index.faiss"
-                faiss.write_index(self.indices[subject], str(index_path))
-                
-                # Save documents
-                docs_path = directory / f"{subject.lower()}_docs.pkl"
-                with open(docs_path, "wb") as f:
-                    pickle.dump(self.documents[subject], f)
-                
-                print(f"Saved {subject} index: {self.indices[subject].ntotal} vectors")
+        subjects = [
+            subject for subject in SUBJECTS
+            if subject in self.indices and self.indices[subject].ntotal > 0
+        ]
+        # Subjects are written to separate files, so save them concurrently
+        with ThreadPoolExecutor(max_workers=len(SUBJECTS)) as executor:
+            list(executor.map(lambda subject: self._save_subject(directory, subject), subjects))
+        
+        for subject in subjects:
+            print(f"Saved {subject} index: {self.indices[subject].ntotal} vectors")
+    
+    def _save_subject(self, directory: Path, subject: str) -> None:
+        """
+        Save one subject's index and documents.
+        
+        Args:
+            directory: Directory to save to
+            subject: Subject to save
+        """
+        # Save FAISS index. Written beside the old file and swapped in, so
+        # processes that memory-mapped the old index keep a valid mapping.
+        index_path = directory / f"{subject.lower()}_index.faiss"
+        tmp_path = index_path.with_suffix(".faiss.tmp")
+        faiss.write_index(self.indices[subject], str(tmp_path))
+        os.replace(tmp_path, index_path)
+        
+        # Save documents. Pickle restores these plain lists faster than
+        # JSON does, but runs code on load: only load stores built locally.
+        docs_path = directory / f"{subject.lower()}_docs.pkl"
+        with open(docs_path, "wb") as f:
+            pickle.dump({
+                "texts": self.texts[subject],
+                "metadatas": self.metadatas[subject]
+            }, f)
     
     def load(self, directory: Path = VECTOR_STORE_DIR) -> None:
         """
@@ -280,20 +546,81 @@ class VectorStore:
         Args:
             directory: Directory to load from
         """
-        for subject in SUBJECTS:
-            index_path = directory / f"{subject.lower()}_index.faiss"
-            docs_path = directory / f"{subject.lower()}_docs.pkl"
-            
-            if index_path.exists() and docs_path.exists():
-                # Load FAISS index
-                self.indices[subject] = faiss.read_index(str(index_path))
-                
-                # Load documents
-                with open(docs_path, "rb") as f:
-                    self.documents[subject] = pickle.load(f)
-                
+        # Each subject is read into its own entries, so load them concurrently
+        with ThreadPoolExecutor(max_workers=len(SUBJECTS)) as executor:
+            loaded = list(executor.map(lambda subject: self._load_subject(directory, subject), SUBJECTS))
+        
+        for subject, was_loaded in zip(SUBJECTS, loaded):
+            if was_loaded:
                 print(f"Loaded {subject} index: {self.indices[subject].ntotal} vectors")
     
+    def _load_subject(self, directory: Path, subject: str) -> bool:
+        """
+        Load one subject's index and documents, if they were saved.
+        
+        Args:
+            directory: Directory to load from
+            subject: Subject to load
+            
+        Returns:
+            Whether the subject was found and loaded
+        """
+        index_path = directory / f"{subject.lower()}_index.faiss"
+        docs_path = directory / f"{subject.lower()}_docs.pkl"
+        
+        if not (index_path.exists() and docs_path.exists()):
+            return False
+        
+        # Load FAISS index
+        self.indices[subject] = self._read_index(subject, index_path)
+        
+        # Load documents
+        with open(docs_path, "rb") as f:
+            documents = pickle.load(f)
+        if isinstance(documents, list):
+            # Stores saved before the parallel-list layout hold one dict per chunk
+            self.texts[subject] = [doc["text"] for doc in documents]
+            self.metadatas[subject] = [doc.get("metadata", {}) for doc in documents]
+        else:
+            self.texts[subject] = documents["texts"]
+            self.metadatas[subject] = documents["metadatas"]
+        self.sources[subject] = [
+            self.source_label(metadata) for metadata in self.metadatas[subject]
+        ]
+        return True
+    
+    def _read_index(self, subject: str, index_path: Path) -> faiss.Index:
+        """
+        Read a saved index, memory-mapping its vector data when possible.
+        
+        Mapped pages are read on first access and shared through the page
+        cache, so startup no longer copies every index into RAM.
+        
+        Args:
+            subject: Subject the index belongs to
+            index_path: Path of the saved index
+            
+        Returns:
+            Loaded FAISS index
+        """
+        mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+        if VECTOR_MMAP and mmap_flag is not None:
+            try:
+                index = faiss.read_index(str(index_path), mmap_flag | faiss.IO_FLAG_READ_ONLY)
+                self._mapped_indices[subject] = index_path
+                return index
+            except RuntimeError:
+                pass  # Index type can't be mapped; read it normally
+        
+        self._mapped_indices.pop(subject, None)
+        return faiss.read_index(str(index_path))
+    
+    def _load_into_memory(self, subject: str) -> None:
+        """Replace a memory-mapped index with an in-RAM copy that can be modified."""
+        index_path = self._mapped_indices.pop(subject, None)
+        if index_path is not None:
+            self.indices[subject] = faiss.read_index(str(index_path))
+    
     def get_stats(self) -> Dict[str, int]:
         """Get statistics about stored indices."""
         stats = {}
@@ -315,11 +642,9 @@ if __name__ == "__main__":
     print(f"Embedding dimension: {len(embedding)}")
     
     # Test index creation
-    test_docs = [
-        {"text": "Photosynthesis is the process by which plants make food.", "metadata": {"subject": "Science", "topic": "Biology"}},
-        {"text": "The equation of a straight line is y = mx + c.", "metadata": {"subject": "Maths", "topic": "Algebra"}},
-    ]
+    test_texts = ["Photosynthesis is the process by which plants make food."]
+    test_metadatas = [{"subject": "Science", "topic": "Biology"}]
     
-    store.create_index("Science", [test_docs[0]])
+    store.create_index("Science", test_texts, test_metadatas)
     results = store.search("How do plants make food?", "Science")
     print(f"\nSearch results: {results}")